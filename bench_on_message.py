@@ -0,0 +1,222 @@
+"""Standalone benchmark: drive main.on_message with a synthetic message corpus.
+
+Run: python bench_on_message.py [--save-baseline] [--max-regression 10]
+
+Each scenario is a mix of message lengths and a trigger hit-rate. Outgoing sends
+and command processing are replaced with no-ops, so only the trigger pipeline is
+measured. Reports messages/sec, p50/p99 latency per message and allocations, and
+compares against bench_on_message_baseline.json when it exists.
+
+main is imported with BOT_STATE_DIR pointing at a fresh temporary directory, so
+the stores, ledger, logs and TTS cache it opens (and writes on exit) never touch
+the bot's real state files; the directory is removed at exit. It does not
+connect to Discord.
+"""
+import argparse
+import asyncio
+import atexit
+import gc
+import json
+import random
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+_state_dir = tempfile.TemporaryDirectory(prefix="bench_on_message_", ignore_cleanup_errors=True)
+os.environ["BOT_STATE_DIR"] = _state_dir.name
+# Registered before main's own exit hooks, so it runs after they have written their files.
+atexit.register(_state_dir.cleanup)
+
+import main  # noqa: E402  (must come after BOT_STATE_DIR is set)
+from variables import dad_trigger, drink_piss_trigger, eat_shit_trigger, gyros_trigger, wordlist
+
+BASELINE_FILE = Path(__file__).resolve().parent / "bench_on_message_baseline.json"
+MESSAGES_PER_SCENARIO = 5000
+SEED = 1234
+
+# name -> (message lengths to pick from, fraction of messages containing a trigger)
+SCENARIOS = {
+    "short-none": ((10, 40), 0.0),
+    "short-10%": ((10, 40), 0.1),
+    "mixed-10%": ((10, 80, 400), 0.1),
+    "mixed-50%": ((10, 80, 400), 0.5),
+    "long-10%": ((1500, 2000), 0.1),
+}
+
+FILLER = (
+    "the a of and to in is it that was for on are with as at be this have from or one had by "
+    "word but not what all were when we there can an your which their said if do will each about "
+    "how up out them then she many some so these would other into has more her two like him see"
+).split()
+
+TRIGGER_PHRASES = (
+    [t.strip() for t in dad_trigger]
+    + list(wordlist) + list(gyros_trigger) + list(eat_shit_trigger) + list(drink_piss_trigger)
+)
+
+
+class FakeUser:
+    __slots__ = ("id",)
+
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+
+class FakeChannel:
+    __slots__ = ("id",)
+
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+
+class FakeGuild:
+    __slots__ = ("id",)
+
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+
+
+class FakeMessage:
+    __slots__ = ("id", "content", "author", "channel", "guild")
+
+    def __init__(self, message_id: int, content: str, author, channel, guild):
+        self.id = message_id
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = guild
+
+
+class NullOutbound:
+    """Stands in for main.outbound: counts sends instead of queueing them."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send(self, channel, content, **kwargs):
+        self.sent += 1
+
+
+def make_text(rng: random.Random, length: int, hit: bool) -> str:
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(FILLER)
+        words.append(word)
+        size += len(word) + 1
+    if hit:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(TRIGGER_PHRASES))
+    return " ".join(words)
+
+
+def make_corpus(lengths, hit_rate: float, count: int, seed: int) -> list[FakeMessage]:
+    rng = random.Random(seed)
+    guilds = [FakeGuild(1000 + i) for i in range(5)]
+    channels = [FakeChannel(2000 + i) for i in range(20)]
+    authors = [FakeUser(3000 + i) for i in range(200)]
+    corpus = []
+    for i in range(count):
+        text = make_text(rng, rng.choice(lengths), rng.random() < hit_rate)
+        channel = rng.choice(channels)
+        corpus.append(FakeMessage(i, text, rng.choice(authors), channel, guilds[channel.id % len(guilds)]))
+    return corpus
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def measure(corpus: list[FakeMessage]) -> dict:
+    on_message = main.on_message
+    for message in corpus[:200]:  # warm up
+        await on_message(message)
+
+    latencies = []
+    gc.collect()
+    start = time.perf_counter()
+    for message in corpus:
+        t0 = time.perf_counter_ns()
+        await on_message(message)
+        latencies.append(time.perf_counter_ns() - t0)
+    elapsed = time.perf_counter() - start
+
+    # Allocations in a separate pass: tracing slows everything down.
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    snapshot_before = tracemalloc.take_snapshot()
+    for message in corpus:
+        await on_message(message)
+    snapshot_after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocated = sum(max(0, s.size_diff) for s in snapshot_after.compare_to(snapshot_before, "filename"))
+
+    latencies.sort()
+    return {
+        "msgs_per_sec": len(corpus) / elapsed,
+        "p50_us": percentile(latencies, 0.50) / 1000,
+        "p99_us": percentile(latencies, 0.99) / 1000,
+        "mean_us": statistics.fmean(latencies) / 1000,
+        "retained_bytes_per_msg": allocated / len(corpus),
+        "peak_bytes": peak - before,
+    }
+
+
+async def run_all(count: int) -> dict:
+    outbound = NullOutbound()
+    main.outbound = outbound
+
+    async def no_commands(message):
+        pass
+
+    main.bot.process_commands = no_commands
+    results = {}
+    for name, (lengths, hit_rate) in SCENARIOS.items():
+        sent_before = outbound.sent
+        results[name] = await measure(make_corpus(lengths, hit_rate, count, SEED))
+        results[name]["sends"] = outbound.sent - sent_before
+    return results
+
+
+def change(new: float, old: float) -> str:
+    return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=MESSAGES_PER_SCENARIO, help="messages per scenario")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store this run in {BASELINE_FILE.name}")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="exit with an error if msgs/sec drops by more than this many percent")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_all(args.messages))
+    baseline = {}
+    if BASELINE_FILE.exists():
+        with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("scenarios", {})
+
+    print(f"{'scenario':<12} {'msgs/s':>10} {'p50 µs':>8} {'p99 µs':>8} {'B/msg':>8} {'peak KiB':>9} {'vs baseline':>12}")
+    worst = 0.0
+    for name, r in results.items():
+        base = baseline.get(name)
+        vs = change(r["msgs_per_sec"], base["msgs_per_sec"]) if base else "-"
+        if base:
+            worst = min(worst, (r["msgs_per_sec"] - base["msgs_per_sec"]) / base["msgs_per_sec"] * 100)
+        print(f"{name:<12} {r['msgs_per_sec']:>10.0f} {r['p50_us']:>8.1f} {r['p99_us']:>8.1f} "
+              f"{r['retained_bytes_per_msg']:>8.1f} {r['peak_bytes'] / 1024:>9.1f} {vs:>12}")
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"messages": args.messages, "scenarios": results}, f, indent=2)
+        print(f"Saved baseline to {BASELINE_FILE}")
+    if args.max_regression is not None and -worst > args.max_regression:
+        raise SystemExit(f"msgs/sec regressed by {-worst:.1f}% (limit {args.max_regression}%)")
+
+
+if __name__ == "__main__":
+    main_cli()
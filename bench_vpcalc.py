@@ -0,0 +1,42 @@
+"""Standalone benchmark: exact VP solver vs the old greedy cart. Run: python bench_vpcalc.py"""
+import time
+
+from vpcalc import VPSolver, calculate_vp, calculate_vp_greedy
+
+MAX_SHORTFALL = 20_000
+STEP = 25
+REPEAT = 5
+
+shortfalls = range(STEP, MAX_SHORTFALL + 1, STEP)
+
+start = time.perf_counter()
+VPSolver()
+print(f"Table build: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+for name, fn in (("greedy", calculate_vp_greedy), ("exact", calculate_vp)):
+    fn(1000, 0)  # warm up (builds the shared table for the exact solver)
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for shortfall in shortfalls:
+            fn(shortfall, 0)
+    per_call = (time.perf_counter() - start) / (REPEAT * len(shortfalls))
+    print(f"{name:>6}: {per_call * 1e6:.2f} µs per call")
+
+cheaper = 0
+saved = 0
+worst = (0, 0)
+for shortfall in shortfalls:
+    _, greedy_total = calculate_vp_greedy(shortfall, 0)
+    _, exact_total = calculate_vp(shortfall, 0)
+    if exact_total > greedy_total:
+        raise SystemExit(f"Exact solver is more expensive for {shortfall} VP: {exact_total} > {greedy_total}")
+    if exact_total < greedy_total:
+        cheaper += 1
+        saved += greedy_total - exact_total
+        worst = max(worst, (greedy_total - exact_total, shortfall))
+
+print(f"Exact is cheaper for {cheaper}/{len(shortfalls)} shortfalls (total saved: {saved})")
+if cheaper:
+    print(f"Largest saving: {worst[0]} at {worst[1]} VP")
+    print("Greedy:", calculate_vp_greedy(worst[1], 0))
+    print("Exact: ", calculate_vp(worst[1], 0))
@@ -0,0 +1,120 @@
+"""Bot-wide pooled HTTP clients with retries and jittered backoff.
+
+One httpx.AsyncClient for our own calls and one httpx.Client for the ElevenLabs
+SDK (its sync client runs in worker threads), both keeping connections alive
+between requests. Requests that are safe to repeat (connection failures, 429,
+502-504) are retried with full-jitter exponential backoff, honouring
+Retry-After when the server sends one.
+"""
+import asyncio
+import random
+import time
+
+import httpx
+
+RETRY_STATUSES = {429, 502, 503, 504}
+# Only errors where the request never reached the server; anything later may already
+# have been billed (e.g. a TTS request that timed out while streaming audio back).
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def backoff_delay(attempt: int, base: float, cap: float, response: httpx.Response | None = None) -> float:
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(cap, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class RetryTransport(httpx.HTTPTransport):
+    def __init__(self, *, retries: int = 2, backoff: float = 0.5, backoff_cap: float = 8.0, **kwargs):
+        super().__init__(**kwargs)
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_cap = backoff_cap
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                response = super().handle_request(request)
+            except RETRY_EXCEPTIONS:
+                if last:
+                    raise
+                time.sleep(backoff_delay(attempt, self.backoff, self.backoff_cap))
+                continue
+            if last or response.status_code not in RETRY_STATUSES:
+                return response
+            response.close()
+            time.sleep(backoff_delay(attempt, self.backoff, self.backoff_cap, response))
+        raise AssertionError("unreachable")
+
+
+class AsyncRetryTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, *, retries: int = 2, backoff: float = 0.5, backoff_cap: float = 8.0, **kwargs):
+        super().__init__(**kwargs)
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_cap = backoff_cap
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                response = await super().handle_async_request(request)
+            except RETRY_EXCEPTIONS:
+                if last:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, self.backoff, self.backoff_cap))
+                continue
+            if last or response.status_code not in RETRY_STATUSES:
+                return response
+            await response.aclose()
+            await asyncio.sleep(backoff_delay(attempt, self.backoff, self.backoff_cap, response))
+        raise AssertionError("unreachable")
+
+
+class HttpClients:
+    """Owns the shared clients. `open()` on startup, `aclose()` on shutdown."""
+
+    def __init__(self, max_connections: int = 20, max_keepalive: int = 10, http2: bool = False,
+                 timeout: float = 30.0, retries: int = 2):
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.http2 = http2
+        if http2 and not http2_available():
+            print("[http] HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1.")
+            self.http2 = False
+        self.timeout = httpx.Timeout(timeout, connect=10.0)
+        self.retries = retries
+        self.async_client: httpx.AsyncClient | None = None
+        self.sync_client: httpx.Client | None = None
+
+    def open(self):
+        if self.async_client is None or self.async_client.is_closed:
+            self.async_client = httpx.AsyncClient(
+                transport=AsyncRetryTransport(retries=self.retries, limits=self.limits, http2=self.http2),
+                timeout=self.timeout,
+            )
+        if self.sync_client is None or self.sync_client.is_closed:
+            self.sync_client = httpx.Client(
+                transport=RetryTransport(retries=self.retries, limits=self.limits, http2=self.http2),
+                timeout=self.timeout,
+            )
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.aclose()
+        if self.sync_client is not None:
+            # Closing can block briefly on sockets held by worker threads.
+            await asyncio.to_thread(self.sync_client.close)
@@ -0,0 +1,150 @@
+"""Batched, deduplicated log output for the timeout scheduler.
+
+Every event is appended as one JSON line to a local log file, in batches from
+a timer thread (like the usage ledger) so the event loop never waits on disk;
+the file is rotated to `<name>.1` once it passes `max_bytes`. The log channel
+only gets a periodic digest, in which repeats of the same (kind, guild, user)
+are folded into a single line with a count.
+"""
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from outbound import MAX_CONTENT
+
+
+class _Entry:
+    __slots__ = ("message", "count", "first", "last")
+
+    def __init__(self, message: str, now: float):
+        self.message = message
+        self.count = 1
+        self.first = now
+        self.last = now
+
+
+class LogDigest:
+    """Collect events and hand `send(text)` a digest every `interval` seconds.
+
+    A digest goes out early once `max_keys` distinct (kind, guild, user) keys are
+    waiting. `send` is a plain callable (e.g. queueing a message); long digests are
+    split into several calls of at most MAX_CONTENT characters.
+    """
+
+    def __init__(self, path, send, interval: float = 300.0, max_keys: int = 25, title: str = "log",
+                 write_delay: float = 2.0, max_bytes: int = 5 * 1024 * 1024):
+        self.path = Path(path)
+        self.send = send
+        self.interval = interval
+        self.max_keys = max_keys
+        self.title = title
+        self.write_delay = write_delay
+        self.max_bytes = max_bytes
+        self._entries: dict[tuple, _Entry] = {}
+        self._pending: list[str] = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        atexit.register(self.write_pending)
+
+    def _write(self, record: dict):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._pending.append(line)
+            if self._timer is None:
+                self._timer = threading.Timer(self.write_delay, self.write_pending)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def write_pending(self):
+        """Append buffered lines to the log file in one write, rotating it first if it is full."""
+        with self._io_lock:
+            with self._lock:
+                lines, self._pending = self._pending, []
+                self._timer = None
+            if not lines:
+                return
+            try:
+                if self.path.exists() and self.path.stat().st_size >= self.max_bytes:
+                    os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+            except OSError as e:
+                print(f"[{self.title}] Could not write {self.path}: {e}")
+
+    def event(self, kind: str, message: str, guild_id: int, user_id: int | None = None):
+        now = time.time()
+        self._write({
+            "ts": datetime.fromtimestamp(now, timezone.utc).isoformat(timespec="seconds"),
+            "kind": kind,
+            "guild_id": guild_id,
+            "user_id": user_id,
+            "message": message,
+        })
+        key = (kind, guild_id, user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = _Entry(message, now)
+            if len(self._entries) >= self.max_keys:
+                self._wakeup.set()
+        else:
+            entry.message = message
+            entry.count += 1
+            entry.last = now
+
+    def _format(self, key: tuple, entry: _Entry) -> str:
+        kind, guild_id, _ = key
+        line = f"`{kind}` {entry.message} (server `{guild_id}`)"
+        if entry.count > 1:
+            line += f" ×{entry.count} since <t:{int(entry.first)}:R>"
+        return line
+
+    def flush(self):
+        if not self._entries:
+            return
+        entries, self._entries = self._entries, {}
+        header = f"[{self.title}] {sum(e.count for e in entries.values())} event(s)"
+        chunk = header
+        for key, entry in entries.items():
+            line = self._format(key, entry)[:MAX_CONTENT - 1]
+            if len(chunk) + 1 + len(line) > MAX_CONTENT:
+                self.send(chunk)
+                chunk = line
+            else:
+                chunk += "\n" + line
+        self.send(chunk)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[{self.title}] Flush failed: {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.flush()
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        await asyncio.to_thread(self.write_pending)
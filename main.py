@@ -1,24 +1,69 @@
 import nextcord
-from nextcord.ext import commands, tasks
+from nextcord.ext import commands
 from nextcord import Interaction
 from nextcord import ButtonStyle
 from nextcord.ui import View, button, Button
+import asyncio
+import io
 import random
 from variables import *
-from vpcalc import calculate_vp
-import httpx
+from vpcalc import calculate_vp, calculate_vp_batch, parse_prices, validate_vp_amount
+from persistence import JsonWriteBehind
+from schedule_store import (
+    NOT_SUSPENDED, SUSPENDED_GUILD, SUSPENDED_MEMBER, TimeoutScheduleStore, next_event_at, window_state,
+)
+from scheduler import PartitionedWorkers, TimerQueue
+from members import LookupBackoff, MemberResolver
+from tts import QueueFull, QuotaExceeded, QuotaTracker, SingleFlight, TTSJobQueue, is_quota_error, synthesize_chunked
+from snipes import SnipeRecord, SnipeStore
+from webhooks import WebhookPool
+from outbound import LOG, NOTICE, OutboundDispatcher
+from log_digest import LogDigest
+from tts_cache import TTSCache, synthesis_key
+from usage_ledger import UsageLedger
+from triggers import TriggerMatcher, TriggerSettingsIndex, WORD, WORD_START
+from http_client import HttpClients
 import os
 import json
 import re
 from datetime import datetime, timedelta, timezone, time as dt_time
-from zoneinfo import ZoneInfo
 from pathlib import Path
 from dotenv import load_dotenv
 from elevenlabs.client import ElevenLabs
 
 load_dotenv()
-elevenlabs = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
-elevenlabs_priority = ElevenLabs(api_key=os.getenv("ELEVENLABS_PRIORITY_KEY")) if os.getenv("ELEVENLABS_PRIORITY_KEY") else None
+# Where the bot keeps its state files (JSON, SQLite, ledger, logs, TTS cache).
+STATE_DIR = Path(os.getenv("BOT_STATE_DIR") or Path(__file__).resolve().parent)
+STATE_DIR.mkdir(parents=True, exist_ok=True)
+# All JSON state files are kept in memory and written out by this in the background.
+state_writer = JsonWriteBehind(delay=2.0)
+
+# One pooled HTTP layer for all outbound calls (quota checks and the ElevenLabs SDK).
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "").lower() in ("1", "true", "yes")  # needs the 'h2' package
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+http_clients = HttpClients(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive=HTTP_MAX_KEEPALIVE,
+    http2=HTTP_HTTP2,
+    timeout=HTTP_TIMEOUT,
+    retries=HTTP_RETRIES,
+)
+
+# ElevenLabs SDK clients, built on startup on top of the shared pool (see open_http_clients).
+elevenlabs: ElevenLabs | None = None
+elevenlabs_priority: ElevenLabs | None = None
+
+def open_http_clients():
+    global elevenlabs, elevenlabs_priority
+    http_clients.open()
+    elevenlabs = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"), httpx_client=http_clients.sync_client)
+    elevenlabs_priority = (
+        ElevenLabs(api_key=os.getenv("ELEVENLABS_PRIORITY_KEY"), httpx_client=http_clients.sync_client)
+        if os.getenv("ELEVENLABS_PRIORITY_KEY") else None
+    )
 
 async def _get_priority_key_remaining_chars() -> int | None:
     """Return remaining characters for ELEVENLABS_PRIORITY_KEY, or None if unavailable."""
@@ -26,59 +71,55 @@ async def _get_priority_key_remaining_chars() -> int | None:
     if not key:
         return None
     try:
-        async with httpx.AsyncClient() as client:
-            r = await client.get(
-                "https://api.elevenlabs.io/v1/user",
-                headers={"xi-api-key": key, "Content-Type": "application/json"},
-                timeout=10,
-            )
-            if r.status_code != 200:
-                return None
-            data = r.json()
-            sub = data.get("subscription", {})
-            limit = sub.get("character_limit", 0)
-            used = sub.get("character_count", 0)
-            return max(0, limit - used)
+        r = await http_clients.async_client.get(
+            "https://api.elevenlabs.io/v1/user",
+            headers={"xi-api-key": key, "Content-Type": "application/json"},
+            timeout=10,
+        )
+        if r.status_code != 200:
+            return None
+        data = r.json()
+        sub = data.get("subscription", {})
+        limit = sub.get("character_limit", 0)
+        used = sub.get("character_count", 0)
+        return max(0, limit - used)
     except Exception:
         return None
 
+# Priority key quota: fetched once, spent locally per request, refreshed in the background.
+priority_quota = QuotaTracker(_get_priority_key_remaining_chars, ttl=300)
+
 # ---------------------------------------------------------------------------------
 # Monthly cap for ELEVENLABS_API_KEY when used by this bot (shared key for other programs)
 # ---------------------------------------------------------------------------------
 BOT_REGULAR_KEY_MONTHLY_LIMIT = 10_000  # characters per calendar month
-ELEVENLABS_BOT_USAGE_FILE = Path(__file__).resolve().parent / "elevenlabs_bot_usage.json"
+ELEVENLABS_BOT_USAGE_FILE = STATE_DIR / "elevenlabs_bot_usage.json"  # legacy, imported once
+
+ELEVENLABS_USAGE_LEDGER_FILE = STATE_DIR / "elevenlabs_usage_ledger.jsonl"
+ELEVENLABS_USAGE_ROLLUP_FILE = STATE_DIR / "elevenlabs_usage_rollup.json"
+
+# Every synthesis is appended to the ledger; monthly totals per key/user are kept in memory.
+usage_ledger = UsageLedger(ELEVENLABS_USAGE_LEDGER_FILE, ELEVENLABS_USAGE_ROLLUP_FILE)
 
-def _get_bot_regular_usage() -> tuple[str, int]:
-    """Return (current_month_yyyy_mm, characters_used_this_month)."""
-    now = datetime.now(timezone.utc)
-    month_key = now.strftime("%Y-%m")
+def _import_legacy_bot_usage():
+    """Carry the old single-counter usage file over into the ledger's rollup."""
     if not ELEVENLABS_BOT_USAGE_FILE.exists():
-        return month_key, 0
+        return
     try:
         with open(ELEVENLABS_BOT_USAGE_FILE, "r", encoding="utf-8") as f:
             data = json.load(f)
-        if data.get("month") != month_key:
-            return month_key, 0
-        return month_key, int(data.get("characters_used", 0))
-    except Exception:
-        return month_key, 0
-
-def _record_bot_regular_usage(chars: int) -> None:
-    """Add chars to this month's usage for the regular key."""
-    month_key, used = _get_bot_regular_usage()
-    used += chars
-    try:
-        with open(ELEVENLABS_BOT_USAGE_FILE, "w", encoding="utf-8") as f:
-            json.dump({"month": month_key, "characters_used": used}, f, indent=2)
+        usage_ledger.import_legacy_total(data["month"], "regular", int(data.get("characters_used", 0)))
     except Exception:
         pass
 
+_import_legacy_bot_usage()
+
 # ---------------------------------------------------------------------------------
 # Persistent trigger settings (message-based triggers: per-channel or server-wide)
 # ---------------------------------------------------------------------------------
 TRIGGER_NAMES = ("dad", "sus", "gyros", "eat_shit", "drink_piss", "shut_up")
 SHUT_UP_USER_ID = 129801271870881793
-TRIGGER_SETTINGS_FILE = Path(__file__).resolve().parent / "trigger_settings.json"
+TRIGGER_SETTINGS_FILE = STATE_DIR / "trigger_settings.json"
 
 def load_trigger_settings():
     """Load (disabled_channels, disabled_guilds). Each is { trigger: [id, ...] }."""
@@ -100,70 +141,55 @@ def load_trigger_settings():
         return empty_c, empty_g
 
 def save_trigger_settings():
-    with open(TRIGGER_SETTINGS_FILE, "w", encoding="utf-8") as f:
-        json.dump({"channels": trigger_disabled_channels, "guilds": trigger_disabled_guilds}, f, indent=2)
-
-trigger_disabled_channels, trigger_disabled_guilds = load_trigger_settings()
+    channels, guilds = trigger_settings.to_lists()
+    state_writer.write(TRIGGER_SETTINGS_FILE, {"channels": channels, "guilds": guilds})
+
+# Disabled triggers as per-guild / per-channel bitmasks (file format above is unchanged).
+trigger_settings = TriggerSettingsIndex.from_lists(TRIGGER_NAMES, *load_trigger_settings())
+
+# All message trigger patterns from variables.py, checked with plain substring scans per message.
+# Dad patterns are added in priority order: "i am " anywhere beats an earlier "i'm ", etc.
+trigger_matcher = (
+    TriggerMatcher()
+    .add("dad", dad_trigger[:-1])
+    .add("dad", dad_trigger[-1:], WORD_START)  # "im " only at the start of a word
+    .add("sus", wordlist, WORD)
+    .add("gyros", gyros_trigger, WORD)
+    .add("eat_shit", eat_shit_trigger)
+    .add("drink_piss", drink_piss_trigger)
+    .compile()
+)
 
 def is_trigger_enabled(channel_id: int, guild_id: int, trigger_name: str) -> bool:
-    if guild_id in trigger_disabled_guilds.get(trigger_name, []):
-        return False
-    return channel_id not in trigger_disabled_channels.get(trigger_name, [])
+    return trigger_settings.is_enabled(channel_id, guild_id, trigger_name)
 
 def set_trigger_enabled(channel_id: int, guild_id: int, trigger_name: str, enabled: bool, scope: str):
     if scope == "server_wide":
-        guilds = trigger_disabled_guilds.setdefault(trigger_name, [])
-        if enabled:
-            if guild_id in guilds:
-                guilds.remove(guild_id)
-        else:
-            if guild_id not in guilds:
-                guilds.append(guild_id)
+        trigger_settings.set_guild_disabled(guild_id, trigger_name, not enabled)
     else:
-        channels = trigger_disabled_channels.setdefault(trigger_name, [])
-        if enabled:
-            if channel_id in channels:
-                channels.remove(channel_id)
-        else:
-            if channel_id not in channels:
-                channels.append(channel_id)
+        trigger_settings.set_channel_disabled(channel_id, trigger_name, not enabled)
     save_trigger_settings()
 
 # ---------------------------------------------------------------------------------
 # Time-me-out: daily self-timeout at a given local time (persistent)
 # ---------------------------------------------------------------------------------
-TIMEOUT_SCHEDULES_FILE = Path(__file__).resolve().parent / "timeout_schedules.json"
-
-def load_timeout_schedules():
-    if not TIMEOUT_SCHEDULES_FILE.exists():
-        return []
-    try:
-        with open(TIMEOUT_SCHEDULES_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("schedules", [])
-    except Exception:
-        return []
+TIMEOUT_SCHEDULES_FILE = STATE_DIR / "timeout_schedules.json"  # legacy, imported once
+TIMEOUT_SCHEDULES_DB = STATE_DIR / "timeout_schedules.db"
 
-def save_timeout_schedules(schedules: list):
-    with open(TIMEOUT_SCHEDULES_FILE, "w", encoding="utf-8") as f:
-        json.dump({"schedules": schedules}, f, indent=2)
+timeout_store = TimeoutScheduleStore(TIMEOUT_SCHEDULES_DB)
+_imported = timeout_store.import_json(TIMEOUT_SCHEDULES_FILE)
+if _imported:
+    print(f"Imported {_imported} timeout schedule(s) from {TIMEOUT_SCHEDULES_FILE.name}")
 
 def get_timeout_schedule(user_id: int, guild_id: int):
-    schedules = load_timeout_schedules()
-    for s in schedules:
-        if s["user_id"] == user_id and s["guild_id"] == guild_id:
-            return s
-    return None
+    return timeout_store.get(user_id, guild_id)
 
 def get_timeout_schedules_for_user(user_id: int, guild_id: int):
     """Return all timeout schedules for a given user in a given guild."""
-    schedules = load_timeout_schedules()
-    return [s for s in schedules if s["user_id"] == user_id and s["guild_id"] == guild_id]
+    return timeout_store.for_user(user_id, guild_id)
 
 def set_timeout_schedule(user_id: int, guild_id: int, channel_id: int, duration_minutes: int, hour: int, minute: int, gmt_offset: int):
-    schedules = load_timeout_schedules()
-    schedules = [s for s in schedules if not (s["user_id"] == user_id and s["guild_id"] == guild_id)]
-    schedules.append({
+    timeout_store.save({
         "user_id": user_id,
         "guild_id": guild_id,
         "channel_id": channel_id,
@@ -173,12 +199,15 @@ def set_timeout_schedule(user_id: int, guild_id: int, channel_id: int, duration_
         "gmt_offset": gmt_offset,
         "last_apply_date": None,
     })
-    save_timeout_schedules(schedules)
+    lookup_backoff.clear(guild_id, user_id)
+    s = timeout_store.get(user_id, guild_id)
+    if s:
+        _arm_timeout_schedule(s)
 
 def remove_timeout_schedule(user_id: int, guild_id: int):
-    schedules = load_timeout_schedules()
-    schedules = [s for s in schedules if not (s["user_id"] == user_id and s["guild_id"] == guild_id)]
-    save_timeout_schedules(schedules)
+    timeout_store.remove(user_id, guild_id)
+    timeout_timers.cancel((user_id, guild_id))
+    lookup_backoff.clear(guild_id, user_id)
 
 def parse_time_24h(s: str):
     """Parse 'HH:MM' or 'H:MM', return (hour, minute) or None."""
@@ -201,7 +230,30 @@ def next_occurrence_utc(hour: int, minute: int, gmt_offset: int) -> datetime:
     return target_in_tz.astimezone(timezone.utc)
 
 
-bot = commands.Bot(
+# Replies, announcements and logs are queued here and sent within Discord's rate limits.
+outbound = OutboundDispatcher()
+
+class Bot(commands.Bot):
+    async def start(self, *args, **kwargs):
+        open_http_clients()
+        outbound.start()
+        timeout_digest.start()
+        await super().start(*args, **kwargs)
+
+    async def close(self):
+        # Stop the scheduler before its workers, and both before the digest they log to.
+        if _timeout_scheduler is not None:
+            _timeout_scheduler.cancel()
+            await asyncio.gather(_timeout_scheduler, return_exceptions=True)
+        await timeout_workers.stop()
+        # The digest's final flush is queued on outbound, which sends its backlog before stopping.
+        await timeout_digest.stop()
+        await outbound.stop()
+        await super().close()
+        await http_clients.aclose()
+
+
+bot = Bot(
     command_prefix=".",
     intents=nextcord.Intents.all(),
     activity=nextcord.Streaming(
@@ -214,8 +266,15 @@ ONLINE_CHANNEL_ID = 1250442534375788586
 TIMEOUT_LOG_CHANNEL_ID = 1250442534375788586  # same channel for timeout scheduler logs
 MIMIC_LOG_CHANNEL_ID = 1475448201715908628
 
-# Channel ID -> last deleted message info
-snipes: dict[int, dict] = {}
+# One long-lived "Mimic" webhook per channel, reused by /mimic
+MIMIC_WEBHOOK_CACHE_SIZE = int(os.getenv("MIMIC_WEBHOOK_CACHE_SIZE", "256"))
+mimic_webhooks = WebhookPool("Mimic", MIMIC_WEBHOOK_CACHE_SIZE)
+
+# Recently deleted messages per channel, for /snipe
+SNIPE_PER_CHANNEL = int(os.getenv("SNIPE_PER_CHANNEL", "10"))
+SNIPE_MAX_ENTRIES = int(os.getenv("SNIPE_MAX_ENTRIES", "5000"))  # across all channels
+SNIPE_TTL_SECONDS = float(os.getenv("SNIPE_TTL_SECONDS", str(6 * 3600)))
+snipes = SnipeStore(SNIPE_PER_CHANNEL, SNIPE_MAX_ENTRIES, SNIPE_TTL_SECONDS)
 
 # ---------------------------------------------------------------------------------
 # Rock Paper Scissors game views
@@ -451,11 +510,16 @@ class CoinflipView(View):
 
 @bot.event
 async def on_ready():
+    global _timeout_scheduler, _webhook_discovery
     print("Bot is online.")
-    timeout_scheduler_task.start()
+    # on_ready fires again after reconnects; only ever run one scheduler.
+    if _timeout_scheduler is None or _timeout_scheduler.done():
+        _timeout_scheduler = asyncio.create_task(timeout_scheduler_task())
+    if _webhook_discovery is None:
+        _webhook_discovery = asyncio.create_task(discover_mimic_webhooks())
     channel = bot.get_channel(ONLINE_CHANNEL_ID)
     if channel:
-        await channel.send("online")
+        outbound.send(channel, "online", priority=LOG)
 
 ######################################################################################################
 ############################################ BOT COMMANDS ############################################
@@ -494,18 +558,55 @@ async def greet(interaction: Interaction):
     await interaction.response.send_message("no")
 
 
+VP_FOOTER_ICON = "https://cdn.discordapp.com/emojis/834771348739326043.gif?size=128&quality=lossless"
+
 @bot.slash_command(name="vpcalculator", description="Suggests VP bundles to purchase based on the item you want to buy and your current balance.")
 async def vp(interaction: nextcord.Interaction, itemprice: float, currentbalance: float):
-    details, total = calculate_vp(itemprice, currentbalance) 
-    
+    try:
+        itemprice = validate_vp_amount(itemprice, "Item price")
+        currentbalance = validate_vp_amount(currentbalance, "Current balance")
+    except ValueError as e:
+        await interaction.response.send_message(str(e), ephemeral=True)
+        return
+    details, total = calculate_vp(itemprice, currentbalance)
+
     embed = nextcord.Embed(
         title=f"Total: €{total}",
         description=details if details else "You already have enough u stoopid",
         color=nextcord.Color.from_rgb(43, 45, 49)
     )
     embed.set_footer(text=f" Item Price: {itemprice} VP | Current Balance: {currentbalance} VP",
-                     icon_url="https://cdn.discordapp.com/emojis/834771348739326043.gif?size=128&quality=lossless")
-    
+                     icon_url=VP_FOOTER_ICON)
+
+    await interaction.send(embed=embed)
+
+@bot.slash_command(name="vpcart", description="Cheapest VP bundles for a whole wishlist at once.")
+async def vp_cart(
+    interaction: nextcord.Interaction,
+    itemprices: str = nextcord.SlashOption(required=True, description="Item prices in VP, e.g. 1775, 2175, 3550"),
+    currentbalance: float = nextcord.SlashOption(required=False, default=0, description="Your current VP balance"),
+):
+    try:
+        prices = parse_prices(itemprices)
+        currentbalance = validate_vp_amount(currentbalance, "Current balance")
+    except ValueError as e:
+        await interaction.response.send_message(str(e), ephemeral=True)
+        return
+    result = calculate_vp_batch(prices, currentbalance)
+
+    details = "\n".join(f"{count}x {vp} VP" for vp, count in result.cart.items())
+    embed = nextcord.Embed(
+        title=f"Total: €{result.total}",
+        description=details if details else "You already have enough u stoopid",
+        color=nextcord.Color.from_rgb(43, 45, 49)
+    )
+    breakdown = "\n".join(
+        f"{i}. {price} VP → +€{cost}" for i, (price, cost) in enumerate(zip(prices, result.item_costs), 1)
+    )
+    embed.add_field(name="Per item (in order, after your balance)", value=breakdown[:1024], inline=False)
+    embed.set_footer(text=f" Items: {len(prices)} ({sum(prices)} VP) | Current Balance: {currentbalance} VP",
+                     icon_url=VP_FOOTER_ICON)
+
     await interaction.send(embed=embed)
 
 @bot.slash_command(name="random", description="only if youre bored")
@@ -571,44 +672,47 @@ async def rps(
         view=view,
     )
 
-@bot.slash_command(name="snipe", description="Show the most recently deleted message in this channel")
-async def snipe(interaction: Interaction):
+@bot.slash_command(name="snipe", description="Show a recently deleted message in this channel")
+async def snipe(
+    interaction: Interaction,
+    index: int = nextcord.SlashOption(
+        required=False, default=1, description=f"1 = most recent, up to {SNIPE_PER_CHANNEL}"
+    ),
+):
     if interaction.guild_id is None:
         await interaction.response.send_message("Use this command in a server.", ephemeral=True)
         return
 
     channel_id = interaction.channel_id
-    data = snipes.get(channel_id)
-    if not data:
-        await interaction.response.send_message("There's nothing to snipe in this channel.", ephemeral=True)
+    record = snipes.get(channel_id, index)
+    if record is None:
+        available = snipes.count(channel_id)
+        if available:
+            await interaction.response.send_message(f"Pick an index between 1 and {available}.", ephemeral=True)
+        else:
+            await interaction.response.send_message("There's nothing to snipe in this channel.", ephemeral=True)
         return
 
-    author = data["author"]
-    content = data["content"]
-    created_at = data["created_at"]
-    deleted_at = data["deleted_at"]
-
     embed = nextcord.Embed(
-        title="Sniped message",
-        description=content or "*[no content]*",
+        title="Sniped message" if index == 1 else f"Sniped message #{index}",
+        description=record.content or "*[no content]*",
         color=nextcord.Color.from_rgb(43, 45, 49),
     )
-    # Use the author's avatar URL if available; otherwise omit it.
-    avatar_url = getattr(getattr(author, "display_avatar", None), "url", None)
-    if avatar_url:
-        embed.set_author(name=str(author), icon_url=avatar_url)
-    if isinstance(created_at, datetime):
+    if record.avatar_url:
+        embed.set_author(name=record.author_name, icon_url=record.avatar_url)
+    else:
+        embed.set_author(name=record.author_name)
+    if record.created_at is not None:
         embed.add_field(
             name="Sent at",
-            value=f"<t:{int(created_at.timestamp())}:F> (<t:{int(created_at.timestamp())}:R>)",
-            inline=False,
-        )
-    if isinstance(deleted_at, datetime):
-        embed.add_field(
-            name="Deleted at",
-            value=f"<t:{int(deleted_at.timestamp())}:F> (<t:{int(deleted_at.timestamp())}:R>)",
+            value=f"<t:{int(record.created_at)}:F> (<t:{int(record.created_at)}:R>)",
             inline=False,
         )
+    embed.add_field(
+        name="Deleted at",
+        value=f"<t:{int(record.deleted_at)}:F> (<t:{int(record.deleted_at)}:R>)",
+        inline=False,
+    )
 
     await interaction.response.send_message(embed=embed)
 
@@ -632,26 +736,23 @@ async def mimic(interaction: Interaction, user: nextcord.Member, message: str):
     print(mimic_log)
     log_channel = bot.get_channel(MIMIC_LOG_CHANNEL_ID)
     if log_channel:
-        try:
-            await log_channel.send(mimic_log)
-        except Exception:
-            pass
-    webhook = None
+        outbound.send(log_channel, mimic_log, priority=LOG)
     try:
-        webhook = await channel.create_webhook(name="Mimic")
         avatar_url = str(user.display_avatar.url)
-        await webhook.send(content=message, username=user.display_name, avatar_url=avatar_url)
+        await mimic_webhooks.send(channel, content=message, username=user.display_name, avatar_url=avatar_url)
         await interaction.followup.send("Mimic sent.", ephemeral=True)
     except nextcord.Forbidden:
         await interaction.followup.send("I need **Manage Webhooks** permission in this channel.", ephemeral=True)
     except Exception as e:
         await interaction.followup.send(f"Failed: {e}", ephemeral=True)
-    finally:
-        if webhook:
-            try:
-                await webhook.delete()
-            except Exception:
-                pass
+
+_webhook_discovery: asyncio.Task | None = None
+
+async def discover_mimic_webhooks():
+    """Pick up the Mimic webhooks left by earlier runs so /mimic doesn't create new ones."""
+    for guild in list(bot.guilds):
+        if guild.me.guild_permissions.manage_webhooks:
+            await mimic_webhooks.discover(guild)
 
 
 # -------------------- Message trigger toggles: /enable, /disable (feature + scope) --------------------
@@ -710,7 +811,7 @@ async def triggers_status(interaction: Interaction):
     for t in TRIGGER_NAMES:
         label = _trigger_label(t)
         ch_on = is_trigger_enabled(channel_id, guild_id, t)
-        guild_disabled = guild_id and guild_id in trigger_disabled_guilds.get(t, [])
+        guild_disabled = guild_id and trigger_settings.is_guild_disabled(guild_id, t)
         if guild_disabled:
             lines.append(f"• **{label}**: off (server-wide)")
         elif ch_on:
@@ -873,154 +974,324 @@ async def timeout_list_user(
         ephemeral=ephemeral,
     )
 
-async def _timeout_log(message: str, guild_id: int):
-    """Send timeout scheduler log to the log channel and print to console."""
-    print(message)
+TIMEOUT_LOG_FILE = STATE_DIR / "timeout_scheduler.log.jsonl"
+TIMEOUT_LOG_DIGEST_SECONDS = float(os.getenv("TIMEOUT_LOG_DIGEST_SECONDS", "300"))
+
+def _send_timeout_digest(text: str):
     ch = bot.get_channel(TIMEOUT_LOG_CHANNEL_ID)
     if ch:
+        outbound.send(ch, text, priority=LOG)
+
+# Every event goes to TIMEOUT_LOG_FILE; the log channel gets a deduplicated digest.
+timeout_digest = LogDigest(TIMEOUT_LOG_FILE, _send_timeout_digest, TIMEOUT_LOG_DIGEST_SECONDS, title="timeout-scheduler")
+
+def _timeout_log(kind: str, message: str, guild_id: int, user_id: int | None = None):
+    """Record a timeout scheduler event (file + next log channel digest) and print to console."""
+    print(f"[timeout-scheduler] {message} (server {guild_id})")
+    timeout_digest.event(kind, message, guild_id, user_id)
+
+async def _process_timeout_schedule(s: dict, now_utc: datetime, guild: nextcord.Guild, member: nextcord.Member) -> bool:
+    """Handle one due schedule: announce an ended timeout and/or apply today's timeout.
+
+    Returns False if the timeout couldn't be applied, so the caller can retry it shortly.
+    """
+    guild_id = s["guild_id"]
+
+    # Check if a previous timeout for this schedule has just ended and notify once.
+    last_end_at_str = s.get("last_timeout_end_at")
+    last_end_notified = s.get("last_timeout_end_notified", True if not last_end_at_str else False)
+
+    # Prefer Discord's own timeout end time (restart-safe), fall back to stored value.
+    discord_end = getattr(member, "communication_disabled_until", None)
+    if discord_end is None:
+        discord_end = getattr(member, "timed_out_until", None)
+
+    if isinstance(discord_end, datetime):
+        last_end_at = discord_end.astimezone(timezone.utc)
+    elif last_end_at_str:
         try:
-            await ch.send(f"[timeout-scheduler] {message}\n**Server ID:** `{guild_id}`")
-        except Exception:
-            pass
+            last_end_at = datetime.fromisoformat(last_end_at_str)
+        except ValueError:
+            last_end_at = None
+    else:
+        last_end_at = None
 
-@tasks.loop(seconds=10)
-async def timeout_scheduler_task():
-    """Apply daily time-me-out at scheduled times (user's local time)."""
-    schedules = load_timeout_schedules()
-    if not schedules:
+    if last_end_at and not last_end_notified and now_utc >= last_end_at:
+        announce_ch = guild.get_channel(s.get("channel_id")) if s.get("channel_id") else guild.system_channel
+        if announce_ch:
+            outbound.send(announce_ch, f"{member.mention} your timeout is over <a:5x30:1338567476962656318>", priority=NOTICE)
+        s["last_timeout_end_notified"] = True
+        timeout_store.update(s, now_utc, must_exist=True)
+    elif last_end_at and not last_end_notified and last_end_at.isoformat() != last_end_at_str:
+        # Discord reports a different end (e.g. a mod changed the timeout): wake up at that time instead.
+        s["last_timeout_end_at"] = last_end_at.isoformat()
+        timeout_store.update(s, now_utc, must_exist=True)
+
+    window = window_state(s, now_utc)
+    today_str = window.today
+
+    # Not yet time for today's timeout in this timezone, or already handled today.
+    if not window.due:
+        return True
+
+    # If we're past the full timeout window for today, skip applying it
+    # (missed for this day) and mark as applied so the next run is tomorrow.
+    if window.remaining is None:
+        s["last_apply_date"] = today_str
+        timeout_store.update(s, now_utc, must_exist=True)
+        return True
+
+    # We're within today's timeout window but after the scheduled start:
+    # apply only the remaining duration for this day.
+    remaining_duration = window.remaining
+    try:
+        await member.timeout(remaining_duration, reason="Scheduled time-me-out")
+    except nextcord.Forbidden:
+        _timeout_log("forbidden", f"Missing permission (need Moderate Members) to timeout user {s['user_id']}.", guild_id, s["user_id"])
+        return False
+    except Exception as e:
+        _timeout_log("timeout_failed", f"Failed to timeout user {s['user_id']}: {e}", guild_id, s["user_id"])
+        return False
+
+    s["last_apply_date"] = today_str
+    # Record when this timeout will end (UTC) for restart-safe notifications.
+    discord_end = getattr(member, "communication_disabled_until", None)
+    if discord_end is None:
+        discord_end = getattr(member, "timed_out_until", None)
+    if isinstance(discord_end, datetime):
+        s["last_timeout_end_at"] = discord_end.astimezone(timezone.utc).isoformat()
+    else:
+        s["last_timeout_end_at"] = (now_utc + remaining_duration).isoformat()
+    s["last_timeout_end_notified"] = False
+    timeout_store.update(s, now_utc, must_exist=True)
+    _timeout_log("applied", f"Applied timeout for user {s['user_id']}.", guild_id, s["user_id"])
+    # Public message in the respective channel: "[user] has been timed out for [x duration]"
+    announce_ch = guild.get_channel(s.get("channel_id")) if s.get("channel_id") else guild.system_channel
+    if announce_ch:
+        # Announce the actual remaining duration that is being applied.
+        total_seconds = int(remaining_duration.total_seconds())
+        remaining_minutes = total_seconds // 60
+        remaining_seconds = total_seconds % 60
+
+        if remaining_minutes >= 60 and remaining_minutes % 60 == 0:
+            dur_str = f"{remaining_minutes // 60}h"
+        elif remaining_minutes >= 60:
+            hours = remaining_minutes // 60
+            mins = remaining_minutes % 60
+            dur_str = f"{hours}h {mins}min"
+        elif remaining_minutes > 0:
+            dur_str = f"{remaining_minutes}min"
+        else:
+            # Less than a minute remaining: show seconds.
+            dur_str = f"{remaining_seconds}s"
+
+        outbound.send(announce_ch, f"{member.mention} has been timed out for **{dur_str}**.", priority=NOTICE)
+    return True
+
+TIMEOUT_RETRY_SECONDS = 10
+TIMEOUT_CATCHUP_CONCURRENCY = 8  # parallel Discord calls during the startup catch-up
+TIMEOUT_SCHEDULER_WORKERS = int(os.getenv("TIMEOUT_SCHEDULER_WORKERS", "4"))  # guild partitions
+TIMEOUT_COMMIT_DELAY = 1.0  # seconds to gather worker changes into one write
+timeout_timers = TimerQueue()
+member_resolver = MemberResolver(ttl=300)
+# Guilds/members that can't be found are retried with exponential backoff instead of every
+# TIMEOUT_RETRY_SECONDS, and their schedule is suspended after TIMEOUT_SUSPEND_AFTER failures in a row.
+lookup_backoff = LookupBackoff(base=TIMEOUT_RETRY_SECONDS, cap=3600)
+TIMEOUT_SUSPEND_AFTER = int(os.getenv("TIMEOUT_SUSPEND_AFTER", "20"))  # 0 = never suspend
+_timeout_scheduler: asyncio.Task | None = None
+
+def _arm_timeout_schedule(s: dict, not_before: float | None = None):
+    if s.get("suspended"):
+        timeout_timers.cancel((s["user_id"], s["guild_id"]))
         return
+    when = next_event_at(s)
+    if not_before is not None:
+        when = max(when, not_before)
+    timeout_timers.arm((s["user_id"], s["guild_id"]), when)
+
+def _lookup_failed(s: dict, reason: int, kind: str, message: str, now: float):
+    """Back off (or suspend) a schedule whose guild or member couldn't be found."""
+    guild_id, user_id = s["guild_id"], s["user_id"]
+    failures, next_try = lookup_backoff.failed(guild_id, user_id, now)
+    if TIMEOUT_SUSPEND_AFTER and failures >= TIMEOUT_SUSPEND_AFTER:
+        s["suspended"] = reason
+        timeout_store.update(s, must_exist=True)
+        _request_timeout_commit()
+        _arm_timeout_schedule(s)
+        _timeout_log("suspended", f"{message} Suspended the schedule after {failures} failed attempts.", guild_id, user_id)
+        return
+    _timeout_log(kind, f"{message} Retrying in {int(next_try - now)}s.", guild_id, user_id)
+    _arm_timeout_schedule(s, next_try)
+
+def resume_timeout_schedules(guild_id: int, user_id: int | None = None, reasons=(SUSPENDED_GUILD, SUSPENDED_MEMBER)):
+    """A guild or member is reachable again: drop its backoff and resume schedules suspended for `reasons`."""
+    lookup_backoff.clear(guild_id, user_id)
+    if user_id is not None:
+        schedules = timeout_store.for_user(user_id, guild_id)
+    else:
+        schedules = timeout_store.for_guild(guild_id)
+    for s in schedules:
+        if s.get("suspended") not in reasons:
+            continue
+        s["suspended"] = NOT_SUSPENDED
+        timeout_store.update(s, must_exist=True)
+        _arm_timeout_schedule(s)
+        _timeout_log("resumed", f"Resumed the schedule for user {s['user_id']}.", guild_id, s["user_id"])
+    timeout_store.commit()
+
+async def _run_timeout_guild(guild_id: int, schedules: list[dict]):
+    """Process one guild's due schedules (runs on that guild's scheduler worker)."""
     now_utc = datetime.now(timezone.utc)
+    now = now_utc.timestamp()
+    retry_at = now + TIMEOUT_RETRY_SECONDS
+    # Anything still in its lookup backoff (e.g. re-armed by a command) waits for it to end.
+    ready = []
     for s in schedules:
-        guild_id = s["guild_id"]
-        if "gmt_offset" in s:
-            tz = timezone(timedelta(hours=s["gmt_offset"]))
-        else:
-            try:
-                tz = ZoneInfo(s.get("timezone", "UTC"))
-            except Exception:
-                tz = timezone.utc
-        guild = bot.get_guild(guild_id)
-        if not guild:
-            await _timeout_log(f"Guild not found (not in cache). User: {s['user_id']}.", guild_id)
+        blocked_until = lookup_backoff.retry_at(guild_id, s["user_id"])
+        if blocked_until is not None and blocked_until > now:
+            _arm_timeout_schedule(s, blocked_until)
+        elif not s.get("suspended"):
+            ready.append(s)
+    schedules = ready
+    if not schedules:
+        return
+    guild = bot.get_guild(guild_id)
+    if not guild:
+        for s in schedules:
+            _lookup_failed(s, SUSPENDED_GUILD, "guild_missing", f"Guild not found (not in cache). User: {s['user_id']}.", now)
+        return
+    members = await member_resolver.resolve(guild, [s["user_id"] for s in schedules])
+
+    for s in schedules:
+        key = (s["user_id"], s["guild_id"])
+        member = members.get(s["user_id"])
+        if member is None:
+            _lookup_failed(s, SUSPENDED_MEMBER, "member_missing", f"Could not fetch member {s['user_id']}.", now)
             continue
-        member = guild.get_member(s["user_id"])
-        if not member:
-            try:
-                member = await guild.fetch_member(s["user_id"])
-            except Exception as e:
-                await _timeout_log(f"Could not fetch member {s['user_id']}: {e}", guild_id)
-                continue
-        if not member:
+        lookup_backoff.clear(guild_id, s["user_id"])
+        try:
+            ok = await _process_timeout_schedule(s, now_utc, guild, member)
+        except Exception as e:
+            print(f"[timeout-scheduler] Error processing {key}: {e}")
+            ok = False
+        s = timeout_store.get(*key)
+        if s is None:
             continue
+        # Never re-arm in the past: an event that is still due after processing is retried later.
+        _arm_timeout_schedule(s, None if ok and next_event_at(s) > now_utc.timestamp() else retry_at)
 
-        # Check if a previous timeout for this schedule has just ended and notify once.
-        last_end_at_str = s.get("last_timeout_end_at")
-        last_end_notified = s.get("last_timeout_end_notified", True if not last_end_at_str else False)
-
-        # Prefer Discord's own timeout end time (restart-safe), fall back to stored value.
-        discord_end = getattr(member, "communication_disabled_until", None)
-        if discord_end is None:
-            discord_end = getattr(member, "timed_out_until", None)
-
-        if isinstance(discord_end, datetime):
-            last_end_at = discord_end.astimezone(timezone.utc)
-        elif last_end_at_str:
-            try:
-                last_end_at = datetime.fromisoformat(last_end_at_str)
-            except ValueError:
-                last_end_at = None
-        else:
-            last_end_at = None
-
-        if last_end_at and not last_end_notified and now_utc >= last_end_at:
-            announce_ch = guild.get_channel(s.get("channel_id")) if s.get("channel_id") else guild.system_channel
-            if announce_ch:
-                try:
-                    await announce_ch.send(f"{member.mention} your timeout is over <a:5x30:1338567476962656318>")
-                except Exception:
-                    pass
-            s["last_timeout_end_notified"] = True
-            updated = [x for x in load_timeout_schedules() if not (x["user_id"] == s["user_id"] and x["guild_id"] == s["guild_id"])]
-            updated.append(s)
-            save_timeout_schedules(updated)
-
-        now_in_tz = now_utc.astimezone(tz)
-        h, mi = s["hour"], s["minute"]
-        scheduled_today = datetime.combine(now_in_tz.date(), dt_time(h, mi), tzinfo=tz)
-        today_str = scheduled_today.date().isoformat()
-
-        # Not yet time for today's timeout in this timezone.
-        if now_in_tz < scheduled_today:
+async def _timeout_worker_batch(batch: tuple[int, list[dict]]):
+    guild_id, schedules = batch
+    try:
+        await _run_timeout_guild(guild_id, schedules)
+    except Exception:
+        # Don't lose the schedules if the whole batch blew up; try again shortly.
+        retry_at = datetime.now(timezone.utc).timestamp() + TIMEOUT_RETRY_SECONDS
+        for s in schedules:
+            if timeout_store.get(s["user_id"], s["guild_id"]):
+                _arm_timeout_schedule(s, retry_at)
+        raise
+    finally:
+        _request_timeout_commit()
+
+timeout_workers = PartitionedWorkers(TIMEOUT_SCHEDULER_WORKERS, _timeout_worker_batch, name="timeout-worker")
+_timeout_commit_handle: asyncio.TimerHandle | None = None
+
+def _request_timeout_commit():
+    """Commit dirty schedules shortly, folding every worker's changes from this tick into one write."""
+    global _timeout_commit_handle
+    if _timeout_commit_handle is None:
+        _timeout_commit_handle = asyncio.get_running_loop().call_later(TIMEOUT_COMMIT_DELAY, _commit_timeout_store)
+
+def _commit_timeout_store():
+    global _timeout_commit_handle
+    _timeout_commit_handle = None
+    timeout_store.commit()
+
+async def reconcile_timeout_schedules():
+    """Bring every schedule up to date in one batch after a (re)start.
+
+    Each schedule is classified once: missed today (just marked handled, no Discord call),
+    in today's window (apply the remaining duration) and/or a past timeout that ended
+    without an announcement. The ones that need Discord are handled concurrently, at most
+    TIMEOUT_CATCHUP_CONCURRENCY at a time, and all changes are written back in one commit.
+    Anything that fails is left due, so the regular scheduler retries it.
+    """
+    now_utc = datetime.now(timezone.utc)
+    missed = 0
+    by_guild: dict[int, list[dict]] = {}
+    for s in timeout_store.all():
+        if s.get("suspended"):
             continue
+        window = window_state(s, now_utc)
+        if window.due and window.remaining is None and not window.end_pending:
+            s["last_apply_date"] = window.today
+            timeout_store.update(s, now_utc, must_exist=True)
+            missed += 1
+        elif window.due or window.end_pending:
+            by_guild.setdefault(s["guild_id"], []).append(s)
 
-        # Already handled today's schedule.
-        if s.get("last_apply_date") == today_str:
-            continue
+    limit = asyncio.Semaphore(TIMEOUT_CATCHUP_CONCURRENCY)
 
-        # Compute this day's timeout window in local time.
-        total_minutes = s["duration_minutes"]
-        full_duration = timedelta(minutes=total_minutes)
-        end_today_local = scheduled_today + full_duration
-
-        # If we're past the full timeout window for today, skip applying it
-        # (missed for this day) and mark as applied so the next run is tomorrow.
-        if now_in_tz >= end_today_local:
-            s["last_apply_date"] = today_str
-            updated = [x for x in load_timeout_schedules() if not (x["user_id"] == s["user_id"] and x["guild_id"] == s["guild_id"])]
-            updated.append(s)
-            save_timeout_schedules(updated)
-            continue
+    async def catch_up(s: dict, guild: nextcord.Guild, member: nextcord.Member):
+        async with limit:
+            await _process_timeout_schedule(s, datetime.now(timezone.utc), guild, member)
 
-        # We're within today's timeout window but after the scheduled start:
-        # apply only the remaining duration for this day.
-        remaining_duration = end_today_local - now_in_tz
-        try:
-            await member.timeout(remaining_duration, reason="Scheduled time-me-out")
-        except nextcord.Forbidden:
-            await _timeout_log(f"Missing permission (need Moderate Members) to timeout user {s['user_id']}.", guild_id)
-            continue
-        except Exception as e:
-            await _timeout_log(f"Failed to timeout user {s['user_id']}: {e}", guild_id)
-            continue
+    async def catch_up_guild(guild_id: int, schedules: list[dict]):
+        guild = bot.get_guild(guild_id)
+        if not guild:
+            return
+        async with limit:
+            members = await member_resolver.resolve(guild, [s["user_id"] for s in schedules])
+        await asyncio.gather(*(
+            catch_up(s, guild, members[s["user_id"]]) for s in schedules if s["user_id"] in members
+        ), return_exceptions=True)
 
-        s["last_apply_date"] = today_str
-        # Record when this timeout will end (UTC) for restart-safe notifications.
-        discord_end = getattr(member, "communication_disabled_until", None)
-        if discord_end is None:
-            discord_end = getattr(member, "timed_out_until", None)
-        if isinstance(discord_end, datetime):
-            s["last_timeout_end_at"] = discord_end.astimezone(timezone.utc).isoformat()
-        else:
-            s["last_timeout_end_at"] = (now_utc + remaining_duration).isoformat()
-        s["last_timeout_end_notified"] = False
-        updated = [x for x in load_timeout_schedules() if not (x["user_id"] == s["user_id"] and x["guild_id"] == s["guild_id"])]
-        updated.append(s)
-        save_timeout_schedules(updated)
-        await _timeout_log(f"Applied timeout for user {s['user_id']}.", guild_id)
-        # Public message in the respective channel: "[user] has been timed out for [x duration]"
-        announce_ch = guild.get_channel(s.get("channel_id")) if s.get("channel_id") else guild.system_channel
-        if announce_ch:
-            # Announce the actual remaining duration that is being applied.
-            total_seconds = int(remaining_duration.total_seconds())
-            remaining_minutes = total_seconds // 60
-            remaining_seconds = total_seconds % 60
-
-            if remaining_minutes >= 60 and remaining_minutes % 60 == 0:
-                dur_str = f"{remaining_minutes // 60}h"
-            elif remaining_minutes >= 60:
-                hours = remaining_minutes // 60
-                mins = remaining_minutes % 60
-                dur_str = f"{hours}h {mins}min"
-            elif remaining_minutes > 0:
-                dur_str = f"{remaining_minutes}min"
-            else:
-                # Less than a minute remaining: show seconds.
-                dur_str = f"{remaining_seconds}s"
-
-            try:
-                await announce_ch.send(f"{member.mention} has been timed out for **{dur_str}**.")
-            except Exception:
-                pass
+    try:
+        await asyncio.gather(*(catch_up_guild(g, ss) for g, ss in by_guild.items()), return_exceptions=True)
+    finally:
+        timeout_store.commit()
+    pending = sum(len(ss) for ss in by_guild.values())
+    print(f"[timeout-scheduler] Startup catch-up: {missed} missed day(s), {pending} schedule(s) in window or awaiting an end announcement.")
+
+async def timeout_scheduler_task():
+    """Apply daily time-me-out at scheduled times (user's local time).
+
+    Sleeps until the earliest schedule event (start or timeout end) is due; /timeout and
+    /timeout_cancel re-arm the queue and wake it up.
+    """
+    await reconcile_timeout_schedules()
+    timeout_workers.start()
+    for s in timeout_store.all():
+        _arm_timeout_schedule(s)
+    while not bot.is_closed():
+        await timeout_timers.wait()
+        now_utc = datetime.now(timezone.utc)
+        # Group due schedules by guild so members are resolved in one request per guild,
+        # and hand each guild to its worker so a slow guild only delays itself.
+        by_guild: dict[int, list[dict]] = {}
+        for key in timeout_timers.pop_due(now_utc.timestamp()):
+            s = timeout_store.get(*key)
+            if s is not None:
+                by_guild.setdefault(s["guild_id"], []).append(s)
+        for guild_id, schedules in by_guild.items():
+            timeout_workers.submit(guild_id, (guild_id, schedules))
+
+# Generated audio cache: identical requests are answered from disk without calling ElevenLabs.
+TTS_CACHE_DIR = STATE_DIR / "tts_cache"
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))  # 0 disables the cache
+tts_cache = TTSCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
+# Identical requests that arrive while one is being synthesized share its result.
+tts_flights = SingleFlight()
+# Bounded synthesis queue: global concurrency cap, round-robin across users, early rejection.
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "2"))
+TTS_MAX_QUEUE = int(os.getenv("TTS_MAX_QUEUE", "20"))
+TTS_MAX_PER_USER = int(os.getenv("TTS_MAX_PER_USER", "3"))
+tts_queue = TTSJobQueue(TTS_MAX_CONCURRENCY, TTS_MAX_QUEUE, TTS_MAX_PER_USER)
+# Long texts are split at sentence/clause breaks and the pieces synthesized in parallel.
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "400"))
+TTS_CHUNK_FAN_OUT = int(os.getenv("TTS_CHUNK_FAN_OUT", "3"))
+TTS_CHUNK_RETRIES = 2
 
 # Voice choices for TTS (display name -> ElevenLabs voice_id)
 generate_voice_choices = {
@@ -1036,6 +1307,51 @@ generate_voice_language_choices = {
     "Chinese": "zh",
 }
 
+async def _synthesize_voice(kwargs: dict, cache_key: str, user_id: int) -> bytes:
+    """Pick an API key, synthesize `kwargs`, charge the characters and cache the audio.
+
+    Runs once per in-flight cache key (see tts_flights), so usage is only charged once
+    however many interactions are waiting on the result. Raises QuotaExceeded.
+    """
+    # An identical request may have finished while this one waited in the queue.
+    cached = await asyncio.to_thread(tts_cache.get, cache_key)
+    if cached is not None:
+        return cached
+    text_len = len(kwargs["text"])
+    is_custom_clone = kwargs.get("use_pvc_as_ivc", False)
+
+    client = elevenlabs
+    if not is_custom_clone and elevenlabs_priority:
+        remaining = await priority_quota.remaining()
+        estimated_chars = text_len * 2
+        if remaining is not None and remaining >= estimated_chars:
+            client = elevenlabs_priority
+    key_name = "priority" if client is elevenlabs_priority else "regular"
+    # Reserve the characters up front so concurrent requests can't overshoot the monthly cap.
+    if key_name == "regular" and not usage_ledger.try_reserve("regular", text_len, BOT_REGULAR_KEY_MONTHLY_LIMIT):
+        raise QuotaExceeded()
+
+    try:
+        audio = await synthesize_chunked(client, kwargs, TTS_CHUNK_CHARS, TTS_CHUNK_FAN_OUT, TTS_CHUNK_RETRIES)
+    except Exception as e:
+        if key_name == "priority" and is_quota_error(e):
+            priority_quota.invalidate()
+        raise
+    else:
+        usage_ledger.record(user_id, key_name, text_len)
+    finally:
+        if key_name == "regular":
+            usage_ledger.release("regular", text_len)
+    if key_name == "priority":
+        priority_quota.spend(text_len)
+
+    voice_id = kwargs["voice_id"]
+    voice_display = {v: k for k, v in generate_voice_choices.items()}
+    print(f"[generate_voice] Voice used: {voice_display.get(voice_id, voice_id)}")
+
+    await asyncio.to_thread(tts_cache.put, cache_key, audio)
+    return audio
+
 @bot.slash_command(name="generate_voice", description="Generate speech audio from your text (restricted).")
 async def generate_voice(
     interaction: Interaction,
@@ -1073,49 +1389,61 @@ async def generate_voice(
     if is_custom_clone:
         kwargs["use_pvc_as_ivc"] = True
 
-    text_len = len(text)
-    month_key, bot_used = _get_bot_regular_usage()
-    regular_cap_ok = (bot_used + text_len) <= BOT_REGULAR_KEY_MONTHLY_LIMIT
+    cache_key = synthesis_key(kwargs)
+    cached = await asyncio.to_thread(tts_cache.get, cache_key)
+    if cached is not None:
+        # Cache hits cost no characters, so they skip the quota checks and the usage ledger.
+        print(f"[generate_voice] Cache hit {cache_key[:12]}")
+        await interaction.followup.send(file=nextcord.File(io.BytesIO(cached), filename=f"voice_{interaction.user.id}.mp3"))
+        return
 
-    client = elevenlabs
-    if not is_custom_clone and elevenlabs_priority:
-        remaining = await _get_priority_key_remaining_chars()
-        estimated_chars = text_len * 2
-        if remaining is not None and remaining >= estimated_chars:
-            client = elevenlabs_priority
-    if client is elevenlabs and not regular_cap_ok:
+    status_shown = False
+
+    async def show_position(position: int):
+        nonlocal status_shown
+        if position == 0 and not status_shown:
+            return  # started right away, nothing to show
+        status_shown = True
+        if position == 0:
+            await interaction.edit_original_message(content="Generating your audio...")
+        else:
+            await interaction.edit_original_message(content=f"Queued for voice generation, position **{position}**...")
+
+    def queued_synthesis():
+        return tts_queue.run(
+            interaction.user.id, lambda: _synthesize_voice(kwargs, cache_key, interaction.user.id), show_position
+        )
+
+    try:
+        # The flight covers the whole wait in the queue, so identical requests arriving
+        # while this one is queued or running share it instead of taking another slot.
+        audio, shared = await tts_flights.run(cache_key, queued_synthesis)
+    except QueueFull as e:
+        if str(e) == "user":
+            msg = f"You already have {TTS_MAX_PER_USER} voice requests waiting. Let those finish first."
+        else:
+            msg = "The voice generation queue is full right now. Try again in a minute."
+        await interaction.followup.send(msg, ephemeral=True)
+        return
+    except QuotaExceeded:
         await interaction.followup.send(
             f"This bot's monthly character limit ({BOT_REGULAR_KEY_MONTHLY_LIMIT:,} characters) for the API key has been reached. Try again next month or use the other voice.",
             ephemeral=True,
         )
         return
-
-    try:
-        audio = client.text_to_speech.convert(**kwargs)
     except Exception as e:
         await interaction.followup.send(f"Failed to generate audio: {e}", ephemeral=True)
         return
+    if shared:
+        print(f"[generate_voice] Shared in-flight synthesis {cache_key[:12]}")
 
-    voice_display = {v: k for k, v in generate_voice_choices.items()}
-    print(f"[generate_voice] Voice used: {voice_display.get(voice_id, voice_id)}")
-
-    if client is elevenlabs:
-        _record_bot_regular_usage(text_len)
-
-    filename = f"voice_{interaction.user.id}.mp3"
-
-    # save to disk
-    with open(filename, "wb") as f:
-        for chunk in audio:
-            f.write(chunk)
-
-    try:
-        # send only the file
-        await interaction.followup.send(file=nextcord.File(filename))
-    finally:
-        # cleanup local file
-        if os.path.exists(filename):
-            os.remove(filename)
+    if status_shown:
+        try:
+            await interaction.delete_original_message()
+        except Exception:
+            pass
+    # Upload straight from memory, no temp file.
+    await interaction.followup.send(file=nextcord.File(io.BytesIO(audio), filename=f"voice_{interaction.user.id}.mp3"))
 
 ######################################################################################################
 ######################################################################################################
@@ -1127,47 +1455,37 @@ async def on_message(message):
 
     channel_id = message.channel.id
     guild_id = message.guild.id if message.guild else 0
-    words = message.content.split(" ")
-
-    # Dad jokes (I'm...) — only one reply per message (if/elif)
-    if is_trigger_enabled(channel_id, guild_id, "dad"):
-        low = message.content.lower()
-        if 'i am ' in low:
-            await message.channel.send('Hi ' + message.content[low.index('i am ')+5:] + ', I\'m Dad')
-        elif 'i\'m ' in low:
-            await message.channel.send('Hi ' + message.content[low.index('i\'m ')+4:] + ', I\'m Dad')
-        elif 'i"m ' in low:
-            await message.channel.send('Hi ' + message.content[low.index('i"m ')+4:] + ', I\'m Dad')
-        elif 'im ' in low:
-            idx = low.index('im ')
-            if idx == 0 or message.content[idx - 1] == ' ':
-                await message.channel.send('Hi ' + message.content[idx+3:] + ', I\'m Dad')
+    enabled = trigger_settings.enabled(channel_id, guild_id)
+    hits = trigger_matcher.first_matches(message.content.lower(), enabled)
+
+    # Replies are queued; several triggers on one message go out as a single send.
+    def reply(content: str, as_reply: bool = False):
+        outbound.send(message.channel, content, reference=message if as_reply else None, coalesce_key=message.id)
+
+    # Dad jokes (I'm...) — only one reply per message
+    dad = hits.get("dad")
+    if dad and "dad" in enabled:
+        reply('Hi ' + message.content[dad.end:] + ', I\'m Dad')
 
     # Sus / wordlist
-    if is_trigger_enabled(channel_id, guild_id, "sus"):
-        for word in words:
-            if word in wordlist:
-                await message.reply('https://cdn.discordapp.com/attachments/852873744912482345/1006523187183501382/SomeOrdinaryGamers_Is_Very_Sus....mp4')
-                break
+    if "sus" in hits and "sus" in enabled:
+        reply('https://cdn.discordapp.com/attachments/852873744912482345/1006523187183501382/SomeOrdinaryGamers_Is_Very_Sus....mp4', True)
 
     # Gyros (imo/imho/opinion)
-    if is_trigger_enabled(channel_id, guild_id, "gyros"):
-        for word in words:
-            if word.lower() in gyros_trigger:
-                await message.reply('https://media.discordapp.net/attachments/877394207571083341/976824012539826176/sadsadddd-1.gif')
-                break
+    if "gyros" in hits and "gyros" in enabled:
+        reply('https://media.discordapp.net/attachments/877394207571083341/976824012539826176/sadsadddd-1.gif', True)
 
     # Eat shit
-    if is_trigger_enabled(channel_id, guild_id, "eat_shit") and 'eat shit' in message.content.lower():
-        await message.channel.send('<:peepoChocolate:1250442571701026867>')
+    if "eat_shit" in hits and "eat_shit" in enabled:
+        reply('<:peepoChocolate:1250442571701026867>')
 
     # Drink piss
-    if is_trigger_enabled(channel_id, guild_id, "drink_piss") and 'drink piss' in message.content.lower():
-        await message.channel.send('<a:peepoLemonade:1475840152503980155>')
+    if "drink_piss" in hits and "drink_piss" in enabled:
+        reply('<a:peepoLemonade:1475840152503980155>')
 
     # Shut up: 20% chance to reply "shut up" when specific user sends a message
-    if message.author.id == SHUT_UP_USER_ID and is_trigger_enabled(channel_id, guild_id, "shut_up") and random.random() < 0.20:
-        await message.reply("shut up")
+    if message.author.id == SHUT_UP_USER_ID and "shut_up" in enabled and random.random() < 0.20:
+        reply("shut up", True)
 
     await bot.process_commands(message)
 
@@ -1179,13 +1497,37 @@ async def on_message_delete(message: nextcord.Message):
     if not message.guild or not isinstance(message.channel, nextcord.TextChannel):
         return
 
-    snipes[message.channel.id] = {
-        "author": message.author,
-        "content": message.content,
-        "created_at": message.created_at if isinstance(message.created_at, datetime) else None,
-        "deleted_at": datetime.now(timezone.utc),
-    }
+    created_at = message.created_at if isinstance(message.created_at, datetime) else None
+    avatar = getattr(message.author, "display_avatar", None)
+    snipes.add(message.channel.id, SnipeRecord(
+        author_id=message.author.id,
+        author_name=str(message.author),
+        avatar_url=getattr(avatar, "url", None),
+        content=message.content,
+        created_at=created_at.timestamp() if created_at else None,
+        deleted_at=datetime.now(timezone.utc).timestamp(),
+    ))
 
-TOKEN = os.getenv("BOT_TOKEN")
-print("Loaded token:", repr(TOKEN))
-bot.run(TOKEN)
+@bot.event
+async def on_member_join(member: nextcord.Member):
+    member_resolver.invalidate(member.guild.id, member.id)
+    resume_timeout_schedules(member.guild.id, member.id)
+
+@bot.event
+async def on_guild_available(guild: nextcord.Guild):
+    # Members that failed to resolve stay suspended until they (re)join.
+    resume_timeout_schedules(guild.id, reasons=(SUSPENDED_GUILD,))
+
+@bot.event
+async def on_guild_join(guild: nextcord.Guild):
+    resume_timeout_schedules(guild.id, reasons=(SUSPENDED_GUILD,))
+
+if __name__ == "__main__":
+    TOKEN = os.getenv("BOT_TOKEN")
+    print("Loaded token:", repr(TOKEN))
+    try:
+        bot.run(TOKEN)
+    finally:
+        state_writer.close()
+        usage_ledger.close()
+        timeout_store.close()
@@ -0,0 +1,97 @@
+"""Bulk member lookups for the time-me-out scheduler, with a short-lived cache and failure backoff."""
+import time
+
+# Discord's gateway member-chunk request takes at most 100 user IDs at a time.
+QUERY_CHUNK_SIZE = 100
+
+
+class MemberResolver:
+    """Resolve many members of one guild at once.
+
+    Cache hits (ours, then the guild's own member cache) are free; everything
+    else is fetched with one gateway chunk request per 100 users instead of a
+    REST call per user. Resolved members are kept for `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._cache: dict[tuple[int, int], tuple[float, object]] = {}
+
+    def _get_cached(self, guild_id: int, user_id: int):
+        entry = self._cache.get((guild_id, user_id))
+        if entry is None:
+            return None
+        expires, member = entry
+        if expires < time.monotonic():
+            del self._cache[(guild_id, user_id)]
+            return None
+        return member
+
+    def _put(self, guild_id: int, member):
+        self._cache[(guild_id, member.id)] = (time.monotonic() + self.ttl, member)
+
+    def invalidate(self, guild_id: int, user_id: int | None = None):
+        """Drop one member, or every member of a guild when `user_id` is None."""
+        if user_id is not None:
+            self._cache.pop((guild_id, user_id), None)
+            return
+        for key in [k for k in self._cache if k[0] == guild_id]:
+            del self._cache[key]
+
+    async def resolve(self, guild, user_ids) -> dict[int, object]:
+        """Return {user_id: member} for the members of `guild` that could be found."""
+        found = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            member = self._get_cached(guild.id, user_id) or guild.get_member(user_id)
+            if member is not None:
+                found[user_id] = member
+                self._put(guild.id, member)
+            else:
+                missing.append(user_id)
+
+        for i in range(0, len(missing), QUERY_CHUNK_SIZE):
+            chunk = missing[i:i + QUERY_CHUNK_SIZE]
+            try:
+                members = await guild.query_members(user_ids=chunk, limit=len(chunk), cache=True)
+            except Exception as e:
+                print(f"[members] Chunk request failed in guild {guild.id}: {e}")
+                continue
+            for member in members:
+                found[member.id] = member
+                self._put(guild.id, member)
+        return found
+
+
+class LookupBackoff:
+    """Negative cache for guild/member lookups that keep failing, keyed by (guild_id, user_id).
+
+    Each consecutive failure doubles the wait before the next attempt (from `base`
+    up to `cap` seconds). A success, or an event showing the guild/member is back,
+    clears the entry.
+    """
+
+    def __init__(self, base: float = 10.0, cap: float = 3600.0):
+        self.base = base
+        self.cap = cap
+        self._entries: dict[tuple[int, int], tuple[int, float]] = {}  # key -> (failures, retry_at)
+
+    def failed(self, guild_id: int, user_id: int, now: float) -> tuple[int, float]:
+        """Record a failure; return (consecutive failures, epoch of the next attempt)."""
+        failures = self._entries.get((guild_id, user_id), (0, 0.0))[0] + 1
+        retry_at = now + min(self.cap, self.base * 2 ** (failures - 1))
+        self._entries[(guild_id, user_id)] = (failures, retry_at)
+        return failures, retry_at
+
+    def retry_at(self, guild_id: int, user_id: int) -> float | None:
+        entry = self._entries.get((guild_id, user_id))
+        return entry[1] if entry else None
+
+    def clear(self, guild_id: int, user_id: int | None = None) -> bool:
+        """Forget one member's failures, or those of a whole guild when `user_id` is None."""
+        if user_id is not None:
+            return self._entries.pop((guild_id, user_id), None) is not None
+        keys = [k for k in self._entries if k[0] == guild_id]
+        for key in keys:
+            del self._entries[key]
+        return bool(keys)
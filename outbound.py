@@ -0,0 +1,183 @@
+"""Central queue for the bot's own channel messages, paced to stay under Discord's rate limits."""
+import asyncio
+import heapq
+import itertools
+import time
+
+# Priority classes, lowest value first.
+REPLY = 0    # direct responses to a user's message
+NOTICE = 1   # announcements users are waiting for (e.g. timeout started/ended)
+LOG = 2      # log channel output
+
+MAX_CONTENT = 2000  # Discord's message length limit
+
+
+class TokenBucket:
+    """`rate` sends per second on average, bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Spend one token and return 0, or return how long to wait until one is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Outgoing:
+    __slots__ = ("priority", "seq", "parts", "reference", "coalesce_key")
+
+    def __init__(self, priority: int, seq: int, content: str, reference, coalesce_key):
+        self.priority = priority
+        self.seq = seq
+        self.parts = [content]
+        self.reference = reference
+        self.coalesce_key = coalesce_key
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class OutboundDispatcher:
+    """Queue messages per channel and send them from one background task.
+
+    `send()` only enqueues, so handlers never wait on Discord. Each channel has its
+    own token bucket (Discord allows about 5 messages per 5 s per channel) on top of
+    a global one; within a channel, messages go out one at a time in priority order,
+    and across channels the highest-priority ready channel goes first. Messages
+    queued with the same `coalesce_key` for the same channel are joined into a
+    single send while they're still waiting.
+    """
+
+    def __init__(self, channel_rate: float = 1.0, channel_burst: float = 5,
+                 global_rate: float = 40.0, global_burst: float = 40, max_pending: int = 50):
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.max_pending = max_pending
+        self._global = TokenBucket(global_rate, global_burst)
+        self._buckets: dict[int, TokenBucket] = {}
+        self._pending: dict[int, list[_Outgoing]] = {}  # channel ID -> heap
+        self._channels: dict[int, object] = {}
+        self._ready: list[tuple[int, int, int]] = []    # (priority, seq, channel ID)
+        self._waiting: list[tuple[float, int]] = []     # (monotonic time, channel ID)
+        self._scheduled: set[int] = set()  # channels in _ready/_waiting or mid-send
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._sends: set[asyncio.Task] = set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Send what's still queued (for up to `drain_timeout` seconds), then stop."""
+        if self._task is not None:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + drain_timeout
+            while (self._pending or self._sends) and not self._task.done() and loop.time() < deadline:
+                await asyncio.sleep(0.05)
+            if self._pending:
+                print(f"[outbound] Dropping {self.pending()} queued message(s) on shutdown")
+            self._task.cancel()
+            await asyncio.gather(self._task, *self._sends, return_exceptions=True)
+            self._task = None
+
+    def pending(self) -> int:
+        return sum(len(q) for q in self._pending.values())
+
+    def send(self, channel, content: str, *, reference=None, priority: int = REPLY, coalesce_key=None):
+        """Queue `content` for `channel` (as a reply if `reference` is a message)."""
+        channel_id = channel.id
+        queue = self._pending.setdefault(channel_id, [])
+        self._channels[channel_id] = channel
+        if coalesce_key is not None:
+            for item in queue:
+                if item.coalesce_key == coalesce_key and \
+                        sum(map(len, item.parts)) + len(item.parts) + len(content) <= MAX_CONTENT:
+                    item.parts.append(content)
+                    item.reference = item.reference or reference
+                    item.priority = min(item.priority, priority)
+                    heapq.heapify(queue)
+                    return
+        if len(queue) >= self.max_pending:
+            print(f"[outbound] Dropping message for channel {channel_id}: {len(queue)} already queued")
+            return
+        heapq.heappush(queue, _Outgoing(priority, next(self._seq), content, reference, coalesce_key))
+        if channel_id not in self._scheduled:
+            self._scheduled.add(channel_id)
+            heapq.heappush(self._ready, (priority, queue[0].seq, channel_id))
+            self._wakeup.set()
+
+    def _reschedule(self, channel_id: int):
+        queue = self._pending.get(channel_id)
+        if queue:
+            heapq.heappush(self._ready, (queue[0].priority, queue[0].seq, channel_id))
+            self._wakeup.set()
+        else:
+            self._scheduled.discard(channel_id)
+            self._pending.pop(channel_id, None)
+            self._channels.pop(channel_id, None)
+
+    def _prune_buckets(self, now: float):
+        # A bucket that has refilled completely is the same as a new one.
+        for channel_id in [c for c, b in self._buckets.items()
+                           if c not in self._scheduled and b.tokens + (now - b.updated) * b.rate >= b.capacity]:
+            del self._buckets[channel_id]
+
+    async def _sleep(self, delay: float | None):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            while self._waiting and self._waiting[0][0] <= now:
+                _, channel_id = heapq.heappop(self._waiting)
+                self._reschedule(channel_id)
+            if not self._ready:
+                self._prune_buckets(now)
+                await self._sleep(self._waiting[0][0] - now if self._waiting else None)
+                continue
+
+            wait = self._global.take(now)
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+            _, _, channel_id = heapq.heappop(self._ready)
+            bucket = self._buckets.get(channel_id)
+            if bucket is None:
+                bucket = self._buckets[channel_id] = TokenBucket(self.channel_rate, self.channel_burst)
+            wait = bucket.take(now)
+            if wait:
+                self._global.tokens += 1  # not spent after all
+                heapq.heappush(self._waiting, (now + wait, channel_id))
+                continue
+
+            item = heapq.heappop(self._pending[channel_id])
+            task = asyncio.create_task(self._deliver(channel_id, self._channels[channel_id], item))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _deliver(self, channel_id: int, channel, item: _Outgoing):
+        content = "\n".join(item.parts)
+        try:
+            if item.reference is not None:
+                await channel.send(content, reference=item.reference)
+            else:
+                await channel.send(content)
+        except Exception as e:
+            print(f"[outbound] Failed to send to channel {channel_id}: {e}")
+        finally:
+            # The next message for this channel only goes out after this one, keeping order.
+            self._reschedule(channel_id)
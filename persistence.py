@@ -0,0 +1,95 @@
+"""Write-behind persistence for the bot's JSON state files.
+
+State lives in memory; callers hand over a snapshot with `write(path, data)` and
+a background thread writes it out after a short delay. Several changes to the
+same file inside that window end up as a single write. Files are replaced
+atomically (temp file + rename), so a crash never leaves a truncated file.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+def atomic_write_json(path: Path, data) -> None:
+    """Write `data` as JSON to a temp file next to `path`, fsync it, then rename over `path`."""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class JsonWriteBehind:
+    def __init__(self, delay: float = 2.0):
+        self.delay = delay
+        self._pending: dict[Path, object] = {}
+        self._deadline: float | None = None
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()  # keeps writes to one file in submission order
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def write(self, path, data) -> None:
+        """Queue `data` (a snapshot the caller won't mutate) to be written to `path`."""
+        with self._cond:
+            self._pending[Path(path)] = data
+            closed = self._closed
+            if not closed:
+                if self._deadline is None:
+                    self._deadline = time.monotonic() + self.delay
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="json-write-behind", daemon=True)
+                    self._thread.start()
+                self._cond.notify()
+        if closed:
+            # Late writes after shutdown go straight to disk.
+            self.flush()
+
+    def flush(self) -> None:
+        """Write everything that is pending right now, in the calling thread."""
+        with self._io_lock:
+            with self._cond:
+                batch, self._pending = self._pending, {}
+                self._deadline = None
+            self._write_batch(batch)
+
+    def close(self) -> None:
+        """Flush pending state and stop the background thread. Safe to call more than once."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and (self._deadline is None or time.monotonic() < self._deadline):
+                    timeout = None if self._deadline is None else self._deadline - time.monotonic()
+                    self._cond.wait(timeout)
+                if self._closed:
+                    return
+            self.flush()
+
+    @staticmethod
+    def _write_batch(batch: dict) -> None:
+        for path, data in batch.items():
+            try:
+                atomic_write_json(path, data)
+            except Exception as e:
+                print(f"[persistence] Failed to write {path}: {e}")
@@ -0,0 +1,237 @@
+"""SQLite storage for daily time-me-out schedules.
+
+One row per (user_id, guild_id). Each row also carries `next_fire_at`, the UTC
+epoch of the next scheduled start that hasn't been handled yet, which the
+scheduler's timer queue is armed with.
+
+All rows are also held in memory, which is the authoritative copy while the
+bot runs. `update()` only marks a row dirty; `commit()` writes every dirty row
+in one transaction, so the scheduler does at most one write per tick.
+"""
+import json
+import sqlite3
+from datetime import date, datetime, timedelta, timezone, time as dt_time
+from pathlib import Path
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+COLUMNS = (
+    "user_id", "guild_id", "channel_id", "duration_minutes", "hour", "minute",
+    "gmt_offset", "timezone", "last_apply_date", "last_timeout_end_at",
+    "last_timeout_end_notified", "next_fire_at", "suspended",
+)
+
+# Why a schedule was suspended (the `suspended` column); it resumes when that is resolved.
+NOT_SUSPENDED = 0
+SUSPENDED_GUILD = 1   # the bot kept failing to find the guild
+SUSPENDED_MEMBER = 2  # the member kept failing to resolve (e.g. they left)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS timeout_schedules (
+    user_id INTEGER NOT NULL,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER,
+    duration_minutes INTEGER NOT NULL,
+    hour INTEGER NOT NULL,
+    minute INTEGER NOT NULL,
+    gmt_offset INTEGER,
+    timezone TEXT,
+    last_apply_date TEXT,
+    last_timeout_end_at TEXT,
+    last_timeout_end_notified INTEGER NOT NULL DEFAULT 1,
+    next_fire_at REAL NOT NULL,
+    suspended INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, guild_id)
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def schedule_tz(s: dict):
+    """Timezone a schedule's hour:minute is in (fixed GMT offset, or a legacy IANA name)."""
+    if s.get("gmt_offset") is not None:
+        return timezone(timedelta(hours=s["gmt_offset"]))
+    try:
+        return ZoneInfo(s.get("timezone") or "UTC")
+    except Exception:
+        return timezone.utc
+
+
+def next_fire_utc(s: dict, now_utc: datetime) -> datetime:
+    """Scheduled start of the first local day, from today on, that hasn't been handled yet.
+
+    That is today, or tomorrow if today's `last_apply_date` is already set. The
+    result may lie in the past (today's start has passed); the scheduler then
+    works out whether the window was missed or is still running.
+    """
+    tz = schedule_tz(s)
+    day = now_utc.astimezone(tz).date()
+    if s.get("last_apply_date"):
+        day = max(day, date.fromisoformat(s["last_apply_date"]) + timedelta(days=1))
+    return datetime.combine(day, dt_time(s["hour"], s["minute"]), tzinfo=tz).astimezone(timezone.utc)
+
+
+class WindowState(NamedTuple):
+    today: str                    # local date (ISO) of today's window
+    due: bool                     # today's start has passed and today hasn't been handled yet
+    remaining: timedelta | None   # time left in today's window if due and still running; None = missed
+    end_pending: bool             # the last timeout has ended (stored time) but wasn't announced
+
+
+def window_state(s: dict, now_utc: datetime) -> WindowState:
+    """Where a schedule stands at `now_utc` relative to today's timeout window."""
+    tz = schedule_tz(s)
+    now_in_tz = now_utc.astimezone(tz)
+    scheduled_today = datetime.combine(now_in_tz.date(), dt_time(s["hour"], s["minute"]), tzinfo=tz)
+    today_str = scheduled_today.date().isoformat()
+    due = now_in_tz >= scheduled_today and s.get("last_apply_date") != today_str
+    remaining = None
+    if due:
+        end_today_local = scheduled_today + timedelta(minutes=s["duration_minutes"])
+        if now_in_tz < end_today_local:
+            remaining = end_today_local - now_in_tz
+    end_pending = False
+    if not s.get("last_timeout_end_notified", True) and s.get("last_timeout_end_at"):
+        try:
+            end_pending = datetime.fromisoformat(s["last_timeout_end_at"]) <= now_utc
+        except ValueError:
+            pass
+    return WindowState(today_str, due, remaining, end_pending)
+
+
+def next_event_at(s: dict) -> float:
+    """UTC epoch of the schedule's next event: its next start, or an earlier un-announced timeout end."""
+    when = s["next_fire_at"]
+    if not s.get("last_timeout_end_notified", True) and s.get("last_timeout_end_at"):
+        try:
+            when = min(when, datetime.fromisoformat(s["last_timeout_end_at"]).timestamp())
+        except ValueError:
+            pass
+    return when
+
+
+class TimeoutScheduleStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._db = sqlite3.connect(self.path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self._rows: dict[tuple[int, int], dict] = {
+            (r["user_id"], r["guild_id"]): self._to_dict(r)
+            for r in self._db.execute("SELECT * FROM timeout_schedules")
+        }
+        self._by_guild: dict[int, set[int]] = {}  # guild ID -> user IDs with a schedule there
+        for user_id, guild_id in self._rows:
+            self._by_guild.setdefault(guild_id, set()).add(user_id)
+        self._dirty: set[tuple[int, int]] = set()
+
+    def close(self):
+        self.commit()
+        self._db.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        s = dict(row)
+        s["last_timeout_end_notified"] = bool(s["last_timeout_end_notified"])
+        # Legacy rows have an IANA timezone and no GMT offset; keep only the one that is set.
+        for key in ("gmt_offset", "timezone"):
+            if s[key] is None:
+                del s[key]
+        return s
+
+    @staticmethod
+    def _to_row(s: dict) -> dict:
+        row = {c: s.get(c) for c in COLUMNS}
+        row["last_timeout_end_notified"] = int(
+            s.get("last_timeout_end_notified", not s.get("last_timeout_end_at"))
+        )
+        row["suspended"] = s.get("suspended") or NOT_SUSPENDED
+        return row
+
+    def import_json(self, json_path) -> int:
+        """Import schedules from the old timeout_schedules.json once. Returns rows imported."""
+        if self._db.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+            return 0
+        json_path = Path(json_path)
+        schedules = []
+        if json_path.exists():
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    schedules = json.load(f).get("schedules", [])
+            except Exception as e:
+                print(f"[schedule_store] Could not read {json_path}: {e}")
+                return 0
+        now_utc = datetime.now(timezone.utc)
+        for s in schedules:
+            self.update(s, now_utc)
+        with self._db:
+            self._db.execute("INSERT INTO meta (key, value) VALUES ('json_imported', ?)", (now_utc.isoformat(),))
+        self.commit()
+        return len(schedules)
+
+    def update(self, s: dict, now_utc: datetime | None = None, must_exist: bool = False):
+        """Insert or replace a schedule in memory (recomputing its next fire time) and mark it dirty.
+
+        With `must_exist`, a schedule that was removed in the meantime is not brought back.
+        """
+        if must_exist and (s["user_id"], s["guild_id"]) not in self._rows:
+            return
+        s["next_fire_at"] = next_fire_utc(s, now_utc or datetime.now(timezone.utc)).timestamp()
+        if "last_timeout_end_notified" not in s:
+            s["last_timeout_end_notified"] = not s.get("last_timeout_end_at")
+        key = (s["user_id"], s["guild_id"])
+        self._rows[key] = dict(s)
+        self._by_guild.setdefault(s["guild_id"], set()).add(s["user_id"])
+        self._dirty.add(key)
+
+    def save(self, s: dict, now_utc: datetime | None = None):
+        """`update()` and write it out right away."""
+        self.update(s, now_utc)
+        self.commit()
+
+    def remove(self, user_id: int, guild_id: int) -> bool:
+        key = (user_id, guild_id)
+        if self._rows.pop(key, None) is None:
+            return False
+        users = self._by_guild[guild_id]
+        users.discard(user_id)
+        if not users:
+            del self._by_guild[guild_id]
+        self._dirty.add(key)
+        self.commit()
+        return True
+
+    def commit(self) -> int:
+        """Write every dirty row (or its deletion) in one transaction. Returns rows written."""
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, set()
+        upserts = [self._to_row(self._rows[k]) for k in dirty if k in self._rows]
+        deletes = [k for k in dirty if k not in self._rows]
+        placeholders = ", ".join(f":{c}" for c in COLUMNS)
+        with self._db:
+            if upserts:
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO timeout_schedules ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                    upserts,
+                )
+            if deletes:
+                self._db.executemany("DELETE FROM timeout_schedules WHERE user_id = ? AND guild_id = ?", deletes)
+        return len(dirty)
+
+    def get(self, user_id: int, guild_id: int) -> dict | None:
+        s = self._rows.get((user_id, guild_id))
+        return dict(s) if s else None
+
+    def for_user(self, user_id: int, guild_id: int) -> list[dict]:
+        s = self.get(user_id, guild_id)
+        return [s] if s else []
+
+    def for_guild(self, guild_id: int) -> list[dict]:
+        return [dict(self._rows[(user_id, guild_id)]) for user_id in self._by_guild.get(guild_id, ())]
+
+    def all(self) -> list[dict]:
+        return [dict(s) for s in self._rows.values()]
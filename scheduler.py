@@ -0,0 +1,103 @@
+"""Timer queue for the time-me-out scheduler: sleep until the earliest due event."""
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class TimerQueue:
+    """Min-heap of (due_epoch, key) with lazy cancellation.
+
+    Re-arming a key just pushes a new entry; stale entries are skipped when they
+    reach the top. `wait()` sleeps until the earliest entry is due, or until
+    `arm`/`cancel` changes what the earliest entry is.
+    """
+
+    def __init__(self, max_sleep: float = 3600.0):
+        self.max_sleep = max_sleep  # re-check now and then in case the wall clock jumped
+        self._heap: list[tuple[float, int, object]] = []
+        self._due: dict[object, float] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def arm(self, key, when: float):
+        """Schedule `key` at UTC epoch `when`, replacing any earlier arming of it."""
+        self._due[key] = when
+        heapq.heappush(self._heap, (when, next(self._seq), key))
+        self._wakeup.set()
+
+    def cancel(self, key):
+        if self._due.pop(key, None) is not None:
+            self._wakeup.set()
+
+    def next_due(self) -> float | None:
+        while self._heap:
+            when, _, key = self._heap[0]
+            if self._due.get(key) == when:
+                return when
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: float) -> list:
+        """Remove and return every key due at or before `now`, earliest first."""
+        keys = []
+        while True:
+            when = self.next_due()
+            if when is None or when > now:
+                return keys
+            _, _, key = heapq.heappop(self._heap)
+            del self._due[key]
+            keys.append(key)
+
+    async def wait(self):
+        """Return once the earliest timer is due (or the queue changed)."""
+        self._wakeup.clear()
+        when = self.next_due()
+        delay = self.max_sleep if when is None else min(when - time.time(), self.max_sleep)
+        if delay <= 0:
+            return
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+
+class PartitionedWorkers:
+    """A fixed pool of worker tasks, each with its own queue.
+
+    Items are routed by an integer partition key (e.g. a guild ID), so all work for
+    one key runs in order on one worker while other partitions carry on. An exception
+    in the handler is logged and only affects the item that raised it.
+    """
+
+    def __init__(self, count: int, handler, name: str = "worker"):
+        self.count = max(1, count)
+        self.handler = handler
+        self.name = name
+        self._queues: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks and not all(t.done() for t in self._tasks):
+            return
+        self._queues = [asyncio.Queue() for _ in range(self.count)]
+        self._tasks = [asyncio.create_task(self._run(q, i)) for i, q in enumerate(self._queues)]
+
+    def submit(self, key: int, item):
+        self._queues[key % self.count].put_nowait(item)
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, queue: asyncio.Queue, index: int):
+        while True:
+            item = await queue.get()
+            try:
+                await self.handler(item)
+            except Exception as e:
+                print(f"[{self.name}-{index}] Error: {e}")
+            finally:
+                queue.task_done()
@@ -0,0 +1,87 @@
+"""Recently deleted messages for /snipe: a small ring buffer per channel, bounded overall."""
+import time
+from collections import OrderedDict, deque
+
+
+class SnipeRecord:
+    """What /snipe shows about a deleted message; no references to nextcord objects."""
+
+    __slots__ = ("author_id", "author_name", "avatar_url", "content", "created_at", "deleted_at")
+
+    def __init__(self, author_id: int, author_name: str, avatar_url: str | None, content: str,
+                 created_at: float | None, deleted_at: float):
+        self.author_id = author_id
+        self.author_name = author_name
+        self.avatar_url = avatar_url
+        self.content = content
+        self.created_at = created_at  # UTC epoch seconds
+        self.deleted_at = deleted_at
+
+
+class SnipeStore:
+    """The last `per_channel` deletions of each channel, at most `max_entries` in total.
+
+    Channels are kept in order of their latest deletion. Records older than `ttl`
+    seconds are dropped, and when the store is over `max_entries`, the oldest
+    records of the least recently active channel go first.
+    """
+
+    def __init__(self, per_channel: int = 10, max_entries: int = 5000, ttl: float = 6 * 3600):
+        self.per_channel = max(1, per_channel)
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._channels: OrderedDict[int, deque[SnipeRecord]] = OrderedDict()
+        self._total = 0
+
+    def __len__(self):
+        return self._total
+
+    def add(self, channel_id: int, record: SnipeRecord):
+        ring = self._channels.get(channel_id)
+        if ring is None:
+            ring = self._channels[channel_id] = deque(maxlen=self.per_channel)
+        else:
+            self._channels.move_to_end(channel_id)
+        if len(ring) < self.per_channel:
+            self._total += 1
+        ring.append(record)  # a full ring drops its oldest record
+        self._evict(record.deleted_at)
+
+    def get(self, channel_id: int, index: int = 1, now: float | None = None) -> SnipeRecord | None:
+        """The `index`-th most recent deletion in the channel (1 = latest), or None."""
+        ring = self._channels.get(channel_id)
+        if ring is None:
+            return None
+        self._expire(channel_id, ring, time.time() if now is None else now)
+        if not 1 <= index <= len(ring):
+            return None
+        return ring[-index]
+
+    def count(self, channel_id: int) -> int:
+        ring = self._channels.get(channel_id)
+        return len(ring) if ring else 0
+
+    def _expire(self, channel_id: int, ring: deque, now: float):
+        cutoff = now - self.ttl
+        while ring and ring[0].deleted_at < cutoff:
+            ring.popleft()
+            self._total -= 1
+        if not ring:
+            del self._channels[channel_id]
+
+    def _evict(self, now: float):
+        # Least recently active channels first: drop them outright once their newest
+        # record has expired, and trim their oldest records while we're over the cap.
+        cutoff = now - self.ttl
+        while self._channels:
+            channel_id, ring = next(iter(self._channels.items()))
+            if ring[-1].deleted_at < cutoff:
+                self._total -= len(ring)
+                del self._channels[channel_id]
+            elif self._total > self.max_entries:
+                ring.popleft()
+                self._total -= 1
+                if not ring:
+                    del self._channels[channel_id]
+            else:
+                return
@@ -0,0 +1,162 @@
+"""Message trigger matching: plain substring scans over the lowercased text, with word-boundary checks."""
+from typing import NamedTuple
+
+# How a pattern has to sit in the message to count as a hit.
+SUBSTRING = "substring"    # anywhere in the text
+WORD = "word"              # a whole space-separated word (like `word in content.split(" ")`)
+WORD_START = "word_start"  # at the start of the text or right after a space
+
+
+class TriggerMatch(NamedTuple):
+    trigger: str
+    pattern: str
+    start: int
+    end: int
+
+
+def _find(text: str, pattern: str, mode: str, pos: int = 0) -> int:
+    """Offset of the first occurrence of `pattern` at or after `pos` that sits right for `mode`, or -1."""
+    n = len(pattern)
+    while True:
+        start = text.find(pattern, pos)
+        if start < 0 or mode == SUBSTRING:
+            return start
+        if start == 0 or text[start - 1] == " ":
+            end = start + n
+            if mode == WORD_START or end == len(text) or text[end] == " ":
+                return start
+        pos = start + 1
+
+
+class TriggerMatcher:
+    """All trigger patterns, checked with `str.find` on the lowercased message.
+
+    Each pattern costs one C-level substring search (plus a boundary check per
+    occurrence), which is cheaper than any single combined regex for the handful of
+    short patterns we have. Patterns are added per trigger in priority order;
+    `first_matches` returns, per trigger, the earliest hit of its highest-priority
+    pattern that occurs at all.
+    """
+
+    def __init__(self):
+        self._patterns: list[tuple[str, str, str]] = []  # (trigger, pattern, mode)
+        self._by_trigger: dict[str, tuple[tuple[str, str], ...]] = {}
+
+    def add(self, trigger: str, patterns, mode: str = SUBSTRING):
+        """Register lowercase `patterns` for `trigger`, after any it already has."""
+        for p in patterns:
+            if p:
+                self._patterns.append((trigger, p, mode))
+        self._by_trigger = {}
+        return self
+
+    def compile(self):
+        by_trigger: dict[str, list[tuple[str, str]]] = {}
+        for trigger, pattern, mode in self._patterns:
+            by_trigger.setdefault(trigger, []).append((pattern, mode))
+        self._by_trigger = {t: tuple(ps) for t, ps in by_trigger.items()}
+        return self
+
+    def scan(self, text: str) -> list[TriggerMatch]:
+        """Return every trigger hit in `text` (already lowercased), ordered by offset."""
+        if not self._by_trigger:
+            self.compile()
+        hits = []
+        for trigger, patterns in self._by_trigger.items():
+            for pattern, mode in patterns:
+                start = _find(text, pattern, mode)
+                while start >= 0:
+                    hits.append(TriggerMatch(trigger, pattern, start, start + len(pattern)))
+                    start = _find(text, pattern, mode, start + 1)
+        hits.sort(key=lambda h: h.start)
+        return hits
+
+    def first_matches(self, text: str, only=None) -> dict[str, TriggerMatch]:
+        """Return {trigger: match} with the highest-priority, earliest hit for each trigger.
+
+        With `only` (a set of trigger names), other triggers aren't searched at all.
+        """
+        if not self._by_trigger:
+            self.compile()
+        found = {}
+        for trigger, patterns in self._by_trigger.items():
+            if only is not None and trigger not in only:
+                continue
+            for pattern, mode in patterns:
+                start = _find(text, pattern, mode)
+                if start >= 0:
+                    found[trigger] = TriggerMatch(trigger, pattern, start, start + len(pattern))
+                    break
+        return found
+
+
+class TriggerSettingsIndex:
+    """Disabled triggers per guild and per channel, stored as one bitmask per ID.
+
+    `enabled(channel_id, guild_id)` is two dict lookups and an OR, and returns a
+    precomputed frozenset of the triggers that are on for that channel.
+    """
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self._bits = {name: 1 << i for i, name in enumerate(self.names)}
+        self._channels: dict[int, int] = {}
+        self._guilds: dict[int, int] = {}
+        # One enabled-set per possible mask (64 for 6 triggers), so lookups never allocate.
+        self._enabled_sets = [
+            frozenset(n for n in self.names if not mask & self._bits[n])
+            for mask in range(1 << len(self.names))
+        ]
+
+    @classmethod
+    def from_lists(cls, names, disabled_channels: dict, disabled_guilds: dict):
+        """Build from the trigger_settings.json layout: { trigger: [id, ...] } for channels and guilds."""
+        index = cls(names)
+        for name, ids in disabled_channels.items():
+            for channel_id in ids:
+                index.set_channel_disabled(channel_id, name, True)
+        for name, ids in disabled_guilds.items():
+            for guild_id in ids:
+                index.set_guild_disabled(guild_id, name, True)
+        return index
+
+    def to_lists(self) -> tuple[dict, dict]:
+        """Return (disabled_channels, disabled_guilds) in the trigger_settings.json layout."""
+        return self._masks_to_lists(self._channels), self._masks_to_lists(self._guilds)
+
+    def _masks_to_lists(self, masks: dict[int, int]) -> dict:
+        out = {name: [] for name in self.names}
+        for id_, mask in masks.items():
+            for name, bit in self._bits.items():
+                if mask & bit:
+                    out[name].append(id_)
+        return out
+
+    @staticmethod
+    def _update(masks: dict[int, int], id_: int, bit: int, disabled: bool):
+        mask = masks.get(id_, 0)
+        mask = mask | bit if disabled else mask & ~bit
+        if mask:
+            masks[id_] = mask
+        else:
+            masks.pop(id_, None)
+
+    def set_channel_disabled(self, channel_id: int, name: str, disabled: bool):
+        bit = self._bits.get(name)
+        if bit:
+            self._update(self._channels, channel_id, bit, disabled)
+
+    def set_guild_disabled(self, guild_id: int, name: str, disabled: bool):
+        bit = self._bits.get(name)
+        if bit:
+            self._update(self._guilds, guild_id, bit, disabled)
+
+    def is_guild_disabled(self, guild_id: int, name: str) -> bool:
+        return bool(self._guilds.get(guild_id, 0) & self._bits.get(name, 0))
+
+    def enabled(self, channel_id: int, guild_id: int) -> frozenset:
+        """Triggers that are on in this channel (neither the channel nor its guild disabled them)."""
+        return self._enabled_sets[self._guilds.get(guild_id, 0) | self._channels.get(channel_id, 0)]
+
+    def is_enabled(self, channel_id: int, guild_id: int, name: str) -> bool:
+        return name in self.enabled(channel_id, guild_id)
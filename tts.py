@@ -0,0 +1,354 @@
+"""ElevenLabs text-to-speech helpers for /generate_voice."""
+import asyncio
+import io
+import random
+import re
+from collections import OrderedDict, deque
+
+from http_client import RETRY_EXCEPTIONS
+
+
+# Retries are left to the shared client's transport (http_client.RetryTransport);
+# the SDK's own retry loop would multiply them.
+_NO_SDK_RETRIES = {"max_retries": 0}
+
+
+def _convert_to_bytes(client, kwargs: dict) -> bytes:
+    # convert() returns a lazy generator; the HTTP request happens while iterating it.
+    buf = io.BytesIO()
+    for chunk in client.text_to_speech.convert(**kwargs, request_options=_NO_SDK_RETRIES):
+        if chunk:
+            buf.write(chunk)
+    return buf.getvalue()
+
+
+async def synthesize(client, kwargs: dict) -> bytes:
+    """Run a (blocking) ElevenLabs synthesis in a worker thread and return the MP3 bytes."""
+    return await asyncio.to_thread(_convert_to_bytes, client, kwargs)
+
+
+# ---------------------------------------------------------------------------------
+# Long texts: split at sentence/clause boundaries, synthesize chunks in parallel,
+# join the MP3 frame streams in order.
+# ---------------------------------------------------------------------------------
+_SENTENCE_END = re.compile(r"(?<=[.!?\u2026\u3002\uff01\uff1f])\s+|(?<=[\u3002\uff01\uff1f])")
+_CLAUSE_END = re.compile(r"(?<=[,;:\u3001\uff0c])\s*")
+# CJK punctuation is split on without any whitespace, so pieces ending in it are rejoined without a space.
+_CJK_BREAKS = "\u3002\uff01\uff1f\u3001\uff0c"
+
+
+def _split_long(piece: str, max_chars: int) -> list[str]:
+    """Split one over-long sentence at clause breaks, then spaces, then hard."""
+    parts = [p for p in _CLAUSE_END.split(piece) if p]
+    if len(parts) > 1:
+        return _pack(parts, max_chars, " ")
+    words = piece.split()
+    if len(words) > 1:
+        return _pack(words, max_chars, " ")
+    return [piece[i:i + max_chars] for i in range(0, len(piece), max_chars)]
+
+
+def _pack(pieces: list[str], max_chars: int, sep: str) -> list[str]:
+    chunks = []
+    cur = ""
+    for piece in pieces:
+        if len(piece) > max_chars:
+            if cur:
+                chunks.append(cur)
+                cur = ""
+            chunks.extend(_split_long(piece, max_chars))
+            continue
+        joiner = "" if cur.endswith(tuple(_CJK_BREAKS)) else sep
+        candidate = f"{cur}{joiner}{piece}" if cur else piece
+        if len(candidate) <= max_chars:
+            cur = candidate
+        else:
+            chunks.append(cur)
+            cur = piece
+    if cur:
+        chunks.append(cur)
+    return [c.strip() for c in chunks if c.strip()]
+
+
+def split_text(text: str, max_chars: int) -> list[str]:
+    """Split `text` into chunks of at most `max_chars`, preferring sentence then clause breaks."""
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+    return _pack([s for s in _SENTENCE_END.split(text) if s], max_chars, " ")
+
+
+_MPEG_BITRATES = {  # kbps by (version is MPEG1, layer III) -> index
+    True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MPEG_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mp3_frame_length(data: bytes, pos: int) -> int | None:
+    """Length of the Layer III frame starting at `pos`, or None if there's no valid header."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[pos + 1] >> 3) & 0x3
+    layer = (data[pos + 1] >> 1) & 0x3
+    bitrate_idx = data[pos + 2] >> 4
+    rate_idx = (data[pos + 2] >> 2) & 0x3
+    padding = (data[pos + 2] >> 1) & 0x1
+    if version == 1 or layer != 1 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _MPEG_BITRATES[mpeg1][bitrate_idx] * 1000
+    sample_rate = _MPEG_SAMPLE_RATES[version][rate_idx]
+    return (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+
+
+def mp3_frames(data: bytes) -> bytes:
+    """Strip ID3 tags and a leading Xing/Info/VBRI header frame, leaving only audio frames.
+
+    Without this, a player would read the first chunk's tag/VBR header and report the
+    joined file's length as that chunk's length.
+    """
+    start = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    end = len(data)
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    frame_len = _mp3_frame_length(data, start)
+    if frame_len and any(tag in data[start:start + min(frame_len, 64)] for tag in (b"Xing", b"Info", b"VBRI")):
+        start += frame_len
+    return data[start:end]
+
+
+def join_mp3(parts: list[bytes]) -> bytes:
+    """Concatenate MP3 streams frame-wise, without re-encoding."""
+    if len(parts) == 1:
+        return parts[0]
+    return b"".join(mp3_frames(p) for p in parts)
+
+
+async def synthesize_chunked(client, kwargs: dict, max_chars: int, fan_out: int = 3, retries: int = 2) -> bytes:
+    """Synthesize `kwargs["text"]` in chunks of at most `max_chars`, at most `fan_out` at a time.
+
+    Each chunk gets its neighbours as previous_text/next_text so the voice flows across
+    the joins. A chunk whose request never reached the server (http_client.RETRY_EXCEPTIONS,
+    even after the transport's own retries) is retried up to `retries` times; 429 and 5xx
+    responses are already retried by the transport, and anything else may have been billed.
+    """
+    chunks = split_text(kwargs["text"], max_chars)
+    if len(chunks) <= 1:
+        return await synthesize(client, kwargs)
+    limit = asyncio.Semaphore(max(1, fan_out))
+
+    async def one(i: int) -> bytes:
+        chunk_kwargs = dict(kwargs, text=chunks[i])
+        if i > 0:
+            chunk_kwargs["previous_text"] = chunks[i - 1]
+        if i + 1 < len(chunks):
+            chunk_kwargs["next_text"] = chunks[i + 1]
+        async with limit:
+            for attempt in range(retries + 1):
+                try:
+                    return await synthesize(client, chunk_kwargs)
+                except RETRY_EXCEPTIONS as e:
+                    if attempt == retries:
+                        raise
+                    print(f"[tts] Chunk {i + 1}/{len(chunks)} failed ({e}), retrying")
+                    await asyncio.sleep(random.uniform(0, 0.5 * 2 ** attempt))
+
+    return join_mp3(await asyncio.gather(*(one(i) for i in range(len(chunks)))))
+
+
+class QuotaExceeded(Exception):
+    """No API key has enough characters left for this request."""
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one upstream call.
+
+    The first caller for a key starts `fn()` as a task; callers arriving while it
+    runs await the same task and get the same result (or exception). The task is
+    shielded, so one waiter being cancelled doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def run(self, key: str, fn) -> tuple[object, bool]:
+        """Return (result, shared); `shared` is True if another caller's call was reused."""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+
+            def _done(t, key=key):
+                if self._inflight.get(key) is t:
+                    del self._inflight[key]
+
+            task.add_done_callback(_done)
+        return await asyncio.shield(task), shared
+
+
+class QuotaTracker:
+    """Remaining characters on an ElevenLabs key, cached and decremented locally.
+
+    `fetch` is a coroutine function returning the remaining characters (or None if
+    unknown). The value is fetched once, then spent locally as audio is generated
+    and refreshed in the background once it is older than `ttl` seconds, so
+    checking it doesn't cost a round-trip. `invalidate()` forces a refresh, e.g.
+    after the API rejected a request.
+    """
+
+    def __init__(self, fetch, ttl: float = 300.0):
+        self.fetch = fetch
+        self.ttl = ttl
+        self._remaining: int | None = None
+        self._fetched_at: float | None = None
+        self._refresh_task: asyncio.Task | None = None
+
+    async def refresh(self) -> int | None:
+        remaining = await self.fetch()
+        loop = asyncio.get_running_loop()
+        self._fetched_at = loop.time()
+        self._remaining = remaining
+        return remaining
+
+    def _refresh_in_background(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self.refresh())
+
+    async def remaining(self) -> int | None:
+        """Cached remaining characters; only waits on the network the very first time."""
+        if self._fetched_at is None:
+            self._refresh_in_background()
+            return await asyncio.shield(self._refresh_task)
+        if asyncio.get_running_loop().time() - self._fetched_at > self.ttl:
+            self._refresh_in_background()
+        return self._remaining
+
+    def spend(self, chars: int):
+        if self._remaining is not None:
+            self._remaining = max(0, self._remaining - chars)
+
+    def invalidate(self):
+        """Treat the cached value as unknown and refresh it now."""
+        self._remaining = None
+        self._refresh_in_background()
+
+
+def is_quota_error(e: Exception) -> bool:
+    """Whether an ElevenLabs error means the key is invalid, rate limited or out of characters."""
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    if status in (401, 429):
+        return True
+    text = str(e).lower()
+    return "quota" in text or "character_limit" in text
+
+
+class QueueFull(Exception):
+    """The TTS queue (or this user's share of it) is at its limit."""
+
+
+class _Job:
+    __slots__ = ("user_id", "fn", "future", "on_position", "position")
+
+    def __init__(self, user_id: int, fn, on_position):
+        self.user_id = user_id
+        self.fn = fn
+        self.future = asyncio.get_running_loop().create_future()
+        self.on_position = on_position
+        self.position: int | None = None
+
+
+class TTSJobQueue:
+    """Bounded TTS job queue: at most `concurrency` jobs run at once, waiting jobs are
+    taken round-robin across users, and submissions beyond `max_depth` waiting jobs
+    (or `max_per_user` per user) are rejected right away with QueueFull.
+
+    `on_position(pos)` is an optional coroutine function called whenever a waiting
+    job's 1-based queue position changes, and with 0 when it starts running.
+    """
+
+    def __init__(self, concurrency: int = 2, max_depth: int = 20, max_per_user: int = 3):
+        self.concurrency = max(1, concurrency)
+        self.max_depth = max_depth
+        self.max_per_user = max_per_user
+        self._waiting: OrderedDict[int, deque[_Job]] = OrderedDict()  # rotation order of users
+        self._depth = 0
+        self._running = 0
+        self._tasks: set[asyncio.Task] = set()
+
+    async def run(self, user_id: int, fn, on_position=None):
+        """Queue `fn()` for `user_id` and return its result once it has run."""
+        user_jobs = self._waiting.get(user_id)
+        if self._depth >= self.max_depth:
+            raise QueueFull("queue")
+        if user_jobs is not None and len(user_jobs) >= self.max_per_user:
+            raise QueueFull("user")
+        job = _Job(user_id, fn, on_position)
+        self._waiting.setdefault(user_id, deque()).append(job)
+        self._depth += 1
+        self._dispatch()
+        return await job.future
+
+    def _order(self) -> list[_Job]:
+        """Waiting jobs in the order they will start: one per user per round."""
+        queues = list(self._waiting.values())
+        order = []
+        depth = 0
+        while len(order) < self._depth:
+            for q in queues:
+                if depth < len(q):
+                    order.append(q[depth])
+            depth += 1
+        return order
+
+    def _dispatch(self):
+        while self._running < self.concurrency and self._waiting:
+            user_id, jobs = next(iter(self._waiting.items()))
+            job = jobs.popleft()
+            if jobs:
+                self._waiting.move_to_end(user_id)
+            else:
+                del self._waiting[user_id]
+            self._depth -= 1
+            if job.future.cancelled():
+                continue
+            self._running += 1
+            self._notify(job, 0)
+            self._spawn(self._run_job(job))
+        for pos, job in enumerate(self._order(), start=1):
+            self._notify(job, pos)
+
+    def _notify(self, job: _Job, position: int):
+        if job.on_position is None or job.position == position:
+            return
+        job.position = position
+        self._spawn(self._safe_callback(job.on_position, position))
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _safe_callback(cb, position: int):
+        try:
+            await cb(position)
+        except Exception as e:
+            print(f"[tts-queue] Position update failed: {e}")
+
+    async def _run_job(self, job: _Job):
+        try:
+            result = await job.fn()
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._running -= 1
+            self._dispatch()
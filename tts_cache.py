@@ -0,0 +1,102 @@
+"""Content-addressed on-disk cache for generated TTS audio, with a byte budget and LRU eviction."""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+def synthesis_key(kwargs: dict) -> str:
+    """Stable hash of every parameter that affects the generated audio."""
+    blob = json.dumps(kwargs, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """MP3 bytes stored as `<key>.mp3` files, indexed in memory in LRU order.
+
+    The index (key -> size) is rebuilt from the directory on startup, oldest
+    mtime first; hits bump the file's mtime so recency survives restarts. When
+    the total size goes over `max_bytes`, least recently used files are deleted.
+    Methods do blocking file I/O; call them via asyncio.to_thread from the bot.
+    """
+
+    def __init__(self, directory, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._index: OrderedDict[str, int] = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.mp3"
+
+    def _load_index(self):
+        entries = []
+        for p in self.directory.glob("*.mp3"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, p.stem, st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total += size
+        self._evict()
+
+    def get(self, key: str) -> bytes | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._total -= self._index.pop(key, 0)
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            print(f"[tts_cache] Failed to store {key}: {e}")
+            return
+        with self._lock:
+            self._total -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._total += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total -= size
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
@@ -0,0 +1,175 @@
+"""Append-only ledger of ElevenLabs character usage, with in-memory monthly totals.
+
+Every synthesis is one JSON line (timestamp, user, key, chars) appended to the
+ledger file. Totals per month, per key and per user are kept in memory, so cap
+checks never touch the disk, and are compacted into a rollup file that records
+how far into the ledger it covers. On startup the rollup is loaded and any
+ledger lines written after it are replayed.
+
+Records are buffered and written in batches from a timer thread.
+"""
+import atexit
+import json
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from persistence import atomic_write_json
+
+
+def month_key(ts: datetime | None = None) -> str:
+    return (ts or datetime.now(timezone.utc)).strftime("%Y-%m")
+
+
+class UsageLedger:
+    def __init__(self, ledger_path, rollup_path, flush_delay: float = 2.0):
+        self.ledger_path = Path(ledger_path)
+        self.rollup_path = Path(rollup_path)
+        self.flush_delay = flush_delay
+        # month -> {"keys": {key: chars}, "users": {user_id (str): chars}}
+        self._months: dict[str, dict] = {}
+        self._ledger_offset = 0
+        self._pending: list[str] = []
+        self._reserved: dict[str, int] = {}
+        self._rollup_dirty = False  # totals changed without a ledger line (legacy import)
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._load()
+        atexit.register(self.close)
+
+    # -- loading -------------------------------------------------------------------
+
+    def _load(self):
+        if self.rollup_path.exists():
+            try:
+                with open(self.rollup_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._months = data.get("months", {})
+                self._ledger_offset = int(data.get("ledger_offset", 0))
+            except Exception as e:
+                print(f"[usage] Could not read {self.rollup_path}: {e}; rebuilding from the ledger")
+                self._months, self._ledger_offset = {}, 0
+        if not self.ledger_path.exists():
+            self._ledger_offset = 0
+            return
+        size = self.ledger_path.stat().st_size
+        if self._ledger_offset > size:
+            self._months, self._ledger_offset = {}, 0
+        with open(self.ledger_path, "rb") as f:
+            f.seek(self._ledger_offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # torn last line from a crash mid-append
+                try:
+                    entry = json.loads(raw)
+                    self._add(entry["month"], entry["key"], entry.get("user_id"), int(entry["chars"]))
+                except Exception:
+                    pass
+                self._ledger_offset += len(raw)
+
+    def import_legacy_total(self, month: str, key: str, chars: int):
+        """Seed a month's total from the old single-counter usage file (only if nothing is recorded)."""
+        with self._lock:
+            if month in self._months or chars <= 0:
+                return
+            self._add(month, key, None, chars)
+            self._rollup_dirty = True
+        self.flush()
+
+    # -- recording -----------------------------------------------------------------
+
+    def _add(self, month: str, key: str, user_id, chars: int):
+        m = self._months.setdefault(month, {"keys": {}, "users": {}})
+        m["keys"][key] = m["keys"].get(key, 0) + chars
+        if user_id is not None:
+            uid = str(user_id)
+            m["users"][uid] = m["users"].get(uid, 0) + chars
+
+    def record(self, user_id: int | None, key: str, chars: int):
+        """Count `chars` against `key` (and `user_id`) for this month and queue the ledger line."""
+        now = datetime.now(timezone.utc)
+        month = month_key(now)
+        line = json.dumps({
+            "ts": now.isoformat(timespec="seconds"),
+            "month": month,
+            "user_id": user_id,
+            "key": key,
+            "chars": chars,
+        }) + "\n"
+        with self._lock:
+            self._add(month, key, user_id, chars)
+            self._pending.append(line)
+            self._arm_timer()
+
+    def _arm_timer(self):
+        # Caller holds self._lock.
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def month_total(self, key: str, month: str | None = None) -> int:
+        m = self._months.get(month or month_key())
+        return m["keys"].get(key, 0) if m else 0
+
+    def try_reserve(self, key: str, chars: int, limit: int) -> bool:
+        """Hold `chars` of this month's `limit` for an in-flight request.
+
+        Concurrent requests can't overshoot the cap: reserved characters count as used
+        until `release()`; call `record()` as well once the characters were really spent.
+        """
+        with self._lock:
+            if self.month_total(key) + self._reserved.get(key, 0) + chars > limit:
+                return False
+            self._reserved[key] = self._reserved.get(key, 0) + chars
+            return True
+
+    def release(self, key: str, chars: int):
+        with self._lock:
+            self._reserved[key] = max(0, self._reserved.get(key, 0) - chars)
+
+    # -- writing -------------------------------------------------------------------
+
+    def flush(self):
+        """Append buffered lines to the ledger in one write, then rewrite the rollup.
+
+        The totals are snapshotted together with the lines being written, so the
+        rollup never counts a record whose line lies past its `ledger_offset`
+        (which would be counted again on the next startup).
+        """
+        with self._io_lock:
+            with self._lock:
+                lines, self._pending = self._pending, []
+                self._timer = None
+                if not lines and not self._rollup_dirty:
+                    return
+                self._rollup_dirty = False
+                months = {m: {"keys": dict(v["keys"]), "users": dict(v["users"])} for m, v in self._months.items()}
+            if lines:
+                blob = "".join(lines).encode("utf-8")
+                try:
+                    with open(self.ledger_path, "ab") as f:
+                        f.write(blob)
+                except OSError as e:
+                    print(f"[usage] Failed to append to {self.ledger_path}: {e}")
+                    with self._lock:
+                        self._pending[:0] = lines
+                        self._rollup_dirty = True
+                        self._arm_timer()
+                    return
+                self._ledger_offset += len(blob)
+            self._write_rollup({"ledger_offset": self._ledger_offset, "months": months})
+
+    def _write_rollup(self, snapshot: dict):
+        try:
+            atomic_write_json(self.rollup_path, snapshot)
+        except OSError as e:
+            print(f"[usage] Failed to write {self.rollup_path}: {e}")
+
+    def close(self):
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self.flush()
@@ -2,6 +2,9 @@ import random
 
 wordlist = ["among us", "among", "amogus", "sus", "sussy", "baka", "impostor"]
 gyros_trigger = ['imo', 'imho', 'opinion']
+dad_trigger = ['i am ', 'i\'m ', 'i"m ', 'im ']  # checked in this order, first one found wins
+eat_shit_trigger = ['eat shit']
+drink_piss_trigger = ['drink piss']
 randomsg = ['Stop talking, your breath is stinky','Waw 100 iq move','<:gremtleman:1006115824098082887>','https://tenor.com/view/hugs-rickroll-gif-24588121','STOP','To be fair, most people cant use their butts to pull things out of the oven.', 'bullocks', 'what', 'bruhga even i don\'t know what you expect me to say', 'did you know:','why do you keep using this command are you that bored','p!random','<:lasaga:857914583087448074> <:slap:1000391225913913414> no', 'You are now breathing manually', 'you', 'https://cdn.discordapp.com/attachments/790917120791150593/1007312615971766442/unknown.png', 'https://media.discordapp.net/attachments/849087322016186369/1003037461380870305/yfXVOfqR.gif', 'https://cdn.discordapp.com/attachments/797700753858494474/1008623774255558676/IMG_0210.webp']
 ebresponse = [
     'Yes', 'No', 'Idk ask someone else', 'Try again', 'Hell yeah', 'Hell naw', 'Go for it', 'Do it at your own risk',
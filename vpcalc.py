@@ -1,31 +1,202 @@
+import math
+import re
+from functools import lru_cache, reduce
+from typing import NamedTuple
+
+import numpy as np
+
+# VP bundle size -> price
+available_bundles = {475:5, 1000:10, 2050:20, 3650:35, 5350:50, 11000:100}
+
+VP_TABLE_MAX = 100_000  # shortfalls up to this are answered straight from the table
+MAX_VP_INPUT = 1_000_000  # largest price/balance accepted from users
+MAX_CART_ITEMS = 50
+
+
+class VPSolver:
+    """Cheapest set of bundles that covers a VP shortfall (going over is allowed).
+
+    Unbounded knapsack, solved once for every shortfall up to `max_vp` into a cost
+    table and a choice table (the bundle to buy first). Bundle sizes share a common
+    factor (25 VP), so the tables are indexed in those units. A lookup is one table
+    read plus walking the choices back to build the cart.
+    """
+
+    def __init__(self, bundles: dict[int, int] = available_bundles, max_vp: int = VP_TABLE_MAX):
+        # Largest first, so ties in price go to the cart with fewer bundles.
+        items = sorted(bundles.items(), reverse=True)
+        self.sizes = [vp for vp, _ in items]
+        self.prices = [price for _, price in items]
+        self.unit = reduce(math.gcd, self.sizes)
+        # Past the table, whole bundles with the best VP per price are taken off first.
+        self._best = max(range(len(self.sizes)), key=lambda i: (self.sizes[i] / self.prices[i], self.sizes[i]))
+        # The table must hold at least one best bundle, or taking them off could overshoot below 0.
+        self.max_units = max(-(-max_vp // self.unit), self.sizes[self._best] // self.unit)
+        self.cost, self.choice = self._build()
+
+    def _build(self):
+        sizes = np.array([s // self.unit for s in self.sizes])
+        prices = np.array(self.prices, dtype=np.int64)
+        n = self.max_units + 1
+        cost = np.zeros(n, dtype=np.int64)
+        choice = np.zeros(n, dtype=np.int8)
+        # cost[u] = min over bundles b of prices[b] + cost[max(0, u - sizes[b])]. Every
+        # entry depends only on entries at least min(sizes) below it, so the table is
+        # filled that many entries at a time.
+        step = int(sizes.min())
+        for start in range(1, n, step):
+            units = np.arange(start, min(start + step, n))
+            candidates = prices[:, None] + cost[np.maximum(units[None, :] - sizes[:, None], 0)]
+            best = candidates.argmin(axis=0)
+            choice[units] = best
+            cost[units] = candidates[best, np.arange(len(units))]
+        return cost, choice
+
+    def solve(self, shortfall: int) -> tuple[dict[int, int], int]:
+        """Return ({bundle VP: count}, total price) for the cheapest cover of `shortfall` VP."""
+        cart: dict[int, int] = {}
+        if shortfall <= 0:
+            return cart, 0
+        units = -(-shortfall // self.unit)
+        total = 0
+        if units > self.max_units:
+            best_units = self.sizes[self._best] // self.unit
+            count = -(-(units - self.max_units) // best_units)
+            cart[self.sizes[self._best]] = count
+            total += count * self.prices[self._best]
+            units -= count * best_units
+        total += int(self.cost[units])
+        while units > 0:
+            i = int(self.choice[units])
+            cart[self.sizes[i]] = cart.get(self.sizes[i], 0) + 1
+            units -= self.sizes[i] // self.unit
+        return dict(sorted(cart.items(), reverse=True)), total
+
+    def totals(self, shortfalls) -> np.ndarray:
+        """Cheapest total price for each shortfall in an array, without building carts."""
+        units = -(-np.maximum(np.asarray(shortfalls, dtype=np.int64), 0) // self.unit)
+        out = np.empty(len(units), dtype=np.int64)
+        in_table = units <= self.max_units
+        out[in_table] = self.cost[units[in_table]]
+        for i in np.flatnonzero(~in_table):
+            out[i] = self.solve(int(units[i]) * self.unit)[1]
+        return out
+
+
+def catalog_key(bundles: dict[int, int]) -> tuple:
+    return tuple(sorted(bundles.items()))
+
+
+_solvers: dict[tuple, VPSolver] = {}
+
+def get_solver(bundles: dict[int, int] = available_bundles) -> VPSolver:
+    """The shared solver for a bundle catalog, built on first use."""
+    key = catalog_key(bundles)
+    solver = _solvers.get(key)
+    if solver is None:
+        solver = _solvers[key] = VPSolver(dict(key))
+    return solver
+
+
+@lru_cache(maxsize=4096)
+def _solve_cached(shortfall: int, catalog: tuple) -> tuple[tuple, int]:
+    cart, total = get_solver(dict(catalog)).solve(shortfall)
+    return tuple(cart.items()), total
+
+
+def solve(shortfall: int, bundles: dict[int, int] = available_bundles) -> tuple[dict[int, int], int]:
+    """`VPSolver.solve` for a catalog, memoized per (shortfall, catalog)."""
+    cart, total = _solve_cached(shortfall, catalog_key(bundles))
+    return dict(cart), total
+
+
+def validate_vp_amount(value, name: str = "amount") -> int:
+    """Turn a user-supplied VP amount into an int, or raise ValueError with a readable message."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number, got {value!r}.") from None
+    if not math.isfinite(number) or number != int(number):
+        raise ValueError(f"{name} must be a whole number of VP.")
+    if not 0 <= number <= MAX_VP_INPUT:
+        raise ValueError(f"{name} must be between 0 and {MAX_VP_INPUT:,} VP.")
+    return int(number)
+
+
+def parse_prices(text: str) -> list[int]:
+    """Parse a pasted list of item prices ("1775, 2175 3550") into validated VP amounts."""
+    parts = [p for p in re.split(r"[\s,;]+", text.strip()) if p]
+    if not parts:
+        raise ValueError("Give at least one item price.")
+    if len(parts) > MAX_CART_ITEMS:
+        raise ValueError(f"At most {MAX_CART_ITEMS} items at a time.")
+    return [validate_vp_amount(p, f"Item {i}") for i, p in enumerate(parts, 1)]
+
+
+class VPBatchResult(NamedTuple):
+    cart: dict[int, int]          # bundle VP -> count, covering every item together
+    total: int                    # price of that cart
+    shortfall: int                # VP missing for all items together
+    item_totals: list[int]        # price of the cheapest cart covering items 1..k, for each k
+    item_costs: list[int]         # what each item adds to the running total
+
+
 def calculate_vp(itemprice, current):
-    available_bundles = {475:5, 1000:10, 2050:20, 3650:35, 5350:50, 11000:100}
+    remaining = itemprice - current #remaining amount of vp needed
+
+    if remaining <= 0:
+        #print("ya already have enough")
+        return "", 0
+
+    cart, total = solve(remaining)
+    details = [f"{count}x {vp} VP" for vp, count in cart.items()]
+    details_str = "\n".join(details)  # Join details for embed
+    return details_str, total  # Return details and total amount
+
+
+def calculate_vp_batch(itemprices: list[int], current: int,
+                       bundles: dict[int, int] = available_bundles) -> VPBatchResult:
+    """Cheapest single purchase covering every item in `itemprices`, plus a per-item breakdown.
+
+    The breakdown looks up the running shortfall after each item in the cost table
+    in one vectorized pass; only the final cart is reconstructed.
+    """
+    shortfalls = np.cumsum(np.asarray(itemprices, dtype=np.int64)) - current
+    item_totals = get_solver(bundles).totals(shortfalls)
+    item_costs = np.diff(item_totals, prepend=0)
+    shortfall = max(0, int(shortfalls[-1])) if len(shortfalls) else 0
+    cart, total = solve(shortfall, bundles)
+    return VPBatchResult(cart, total, shortfall, item_totals.tolist(), item_costs.tolist())
+
+
+def calculate_vp_greedy(itemprice, current):
+    """The original largest-bundle-first cart (kept for comparison, see bench_vpcalc.py)."""
     sorted_bundles = sorted(available_bundles.items(), reverse=True)
-    
+
     remaining = itemprice - current #remaining amount of vp needed
-    
+
     if remaining <= 0:
         #print("ya already have enough")
         return "", 0
-    
+
     total = 0
     cart = {}
-    
-    for vp, cost in sorted_bundles: 
+
+    for vp, cost in sorted_bundles:
         if remaining <= 0:
             break
         count = remaining // vp
         if count > 0:
-            cart[vp] = count 
+            cart[vp] = count
             total += count * cost #add to total amount the current total sum of amount of bundles
             remaining -= count * vp
-    
+
     if remaining > 0:
         b475 = sorted_bundles[-1]
         cart[b475[0]] = cart.get(b475[0], 0) + 1
         total += b475[1]
-        
 
-    details = [f"{count}x {vp} VP" for vp, count in cart.items()] 
+
+    details = [f"{count}x {vp} VP" for vp, count in cart.items()]
     details_str = "\n".join(details)  # Join details for embed
     return details_str, total  # Return details and total amount
@@ -0,0 +1,76 @@
+"""One reusable webhook per channel for /mimic, instead of create/send/delete per call."""
+import asyncio
+from collections import OrderedDict
+
+import nextcord
+
+
+class WebhookPool:
+    """Channel ID -> the bot's webhook named `name` in that channel, LRU-bounded.
+
+    Webhooks are looked up in the channel before one is created, so restarts reuse
+    the ones made by earlier runs (`discover()` preloads them for a whole guild).
+    A webhook is only recreated when Discord says it no longer exists. Evicting a
+    channel from the cache just forgets it; the webhook stays for next time.
+    """
+
+    def __init__(self, name: str = "Mimic", max_size: int = 256):
+        self.name = name
+        self.max_size = max(1, max_size)
+        self._cache: OrderedDict[int, nextcord.Webhook] = OrderedDict()
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    def _ours(self, webhook: nextcord.Webhook) -> bool:
+        # Only webhooks created by this bot come back with a token we can send with.
+        return webhook.name == self.name and webhook.token is not None
+
+    def _put(self, channel_id: int, webhook: nextcord.Webhook):
+        self._cache[channel_id] = webhook
+        self._cache.move_to_end(channel_id)
+        while len(self._cache) > self.max_size:
+            old_id, _ = self._cache.popitem(last=False)
+            lock = self._locks.get(old_id)
+            if lock is not None and not lock.locked():
+                del self._locks[old_id]
+
+    def invalidate(self, channel_id: int):
+        self._cache.pop(channel_id, None)
+
+    async def discover(self, guild: nextcord.Guild):
+        """Cache the existing pool webhooks of every channel in `guild` (one API call)."""
+        try:
+            webhooks = await guild.webhooks()
+        except nextcord.HTTPException as e:
+            print(f"[webhooks] Could not list webhooks in guild {guild.id}: {e}")
+            return
+        for webhook in webhooks:
+            if self._ours(webhook) and webhook.channel_id not in self._cache:
+                self._put(webhook.channel_id, webhook)
+
+    async def get(self, channel: nextcord.TextChannel) -> nextcord.Webhook:
+        webhook = self._cache.get(channel.id)
+        if webhook is not None:
+            self._cache.move_to_end(channel.id)
+            return webhook
+        # Concurrent calls for one channel share a single lookup/creation.
+        lock = self._locks.setdefault(channel.id, asyncio.Lock())
+        async with lock:
+            webhook = self._cache.get(channel.id)
+            if webhook is None:
+                webhook = next((w for w in await channel.webhooks() if self._ours(w)), None)
+                if webhook is None:
+                    webhook = await channel.create_webhook(name=self.name)
+                self._put(channel.id, webhook)
+            return webhook
+
+    async def send(self, channel: nextcord.TextChannel, **kwargs):
+        """`webhook.send(**kwargs)` through the channel's pooled webhook."""
+        webhook = await self.get(channel)
+        try:
+            return await webhook.send(**kwargs)
+        except nextcord.NotFound:
+            # Deleted by someone else since we cached it: make a new one and retry once.
+            if self._cache.get(channel.id) is webhook:
+                self.invalidate(channel.id)
+            webhook = await self.get(channel)
+            return await webhook.send(**kwargs)